@@ -0,0 +1,214 @@
+import argparse
+import fnmatch
+import json
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import requests
+from azure.core.exceptions import AzureError, HttpResponseError
+from azure.storage.blob import BlobClient, ContentSettings
+from chunked_upload import upload_in_blocks, stream_size, DEFAULT_BLOCK_SIZE
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_PATTERNS = ("*.pdf", "*.docx")
+
+
+class RetryableError(Exception):
+    pass
+
+
+def is_retryable(error):
+    """Network errors, throttling and server errors are worth retrying; other client errors are not"""
+    if isinstance(error, RetryableError):
+        return True
+    if isinstance(error, HttpResponseError):
+        return error.status_code is None or error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, AzureError))
+
+
+def with_retries(action, retries, backoff):
+    """
+    Run an action, retrying retryable errors with exponential backoff.
+    Returns:
+        tuple: (result of the action, number of attempts).
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return action(), attempt
+        except Exception as e:
+            if attempt > retries or not is_retryable(e):
+                e.attempts = attempt
+                raise
+            time.sleep(backoff * (2 ** (attempt - 1)))
+
+
+def request_upload_info(azure_function_url, access_token, patient_id, file_name, file_type, timeout=30):
+    """
+    Ask the Azure Function for the upload URL of a patient file.
+    Returns:
+        dict: Upload info with file_url, file_id, patient_id and expiration.
+    """
+    response = requests.post(
+        f"{azure_function_url}/patients/{patient_id}/files/upload-file-info",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={"file_name": file_name, "file_type": file_type},
+        timeout=timeout
+    )
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryableError(f"Failed to get upload info: {response.status_code} {response.text}")
+    if response.status_code != 200:
+        raise ValueError(f"Failed to get upload info: {response.status_code} {response.text}")
+    upload_info = response.json()
+    if not upload_info.get('file_url'):
+        raise ValueError("No file_url returned in upload info.")
+    return upload_info
+
+
+def request_upload_infos(azure_function_url, access_token, patient_id, file_type, file_names,
+                         max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                         track_upstream=None):
+    """
+    Ask for the upload URLs of many files concurrently.
+    Returns:
+        list: One dict per file, in order, with either the upload info or the error.
+    """
+    track_upstream = track_upstream or (lambda upstream: nullcontext())
+
+    def request_one(file_name):
+        def action():
+            with track_upstream("azure_function"):
+                return request_upload_info(azure_function_url, access_token, patient_id, file_name, file_type)
+        try:
+            upload_info, attempts = with_retries(action, retries, backoff)
+            return {"file_name": file_name, "status": "ok", "attempts": attempts, **upload_info}
+        except Exception as e:
+            return {"file_name": file_name, "status": "failed", "attempts": getattr(e, "attempts", 1), "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(request_one, file_names))
+
+
+def upload_batch(azure_function_url, access_token, patient_id, file_type, files,
+                 max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 block_size=DEFAULT_BLOCK_SIZE, track_upstream=None, progress_callback=None):
+    """
+    Get an upload URL for each file and upload the files with a bounded worker pool.
+    Each file is uploaded on its own, so a failure never stops the rest of the batch.
+    Args:
+        azure_function_url (str): Base URL of the Azure Function.
+        access_token (str): Bearer token of the user.
+        patient_id (str): Patient the files belong to.
+        file_type (str): Type of the files (e.g. "genetic-report").
+        files (list): (file_name, open_stream, content_type) tuples; open_stream() returns a context manager
+            giving a binary stream positioned at the start of the file, and is called again on each retry.
+        max_workers (int): Number of files uploaded at the same time.
+        retries (int): Retries of each step after a network, throttling or server error.
+        backoff (float): Seconds before the first retry, doubled on each new retry.
+        block_size (int): Block size of the uploads, in bytes.
+        track_upstream (callable): Optional context manager factory, called with the upstream name, to time the calls.
+        progress_callback (callable): Called with the result of each file once it is done, one file at a time.
+    Returns:
+        list: One result dict per file, in order, with its status ("uploaded" or "failed"), size,
+        attempts of each step and error.
+    """
+    track_upstream = track_upstream or (lambda upstream: nullcontext())
+    progress_lock = threading.Lock()
+
+    def upload_one(file):
+        file_name, open_stream, content_type = file
+        start = time.perf_counter()
+        result = {"file_name": file_name, "status": "failed", "bytes": 0, "info_attempts": 0, "upload_attempts": 0}
+        step = "info_attempts"
+        try:
+            def get_info():
+                with track_upstream("azure_function"):
+                    return request_upload_info(azure_function_url, access_token, patient_id, file_name, file_type)
+            upload_info, result[step] = with_retries(get_info, retries, backoff)
+            result["file_id"] = upload_info.get('file_id')
+            step = "upload_attempts"
+
+            blob_client = BlobClient.from_blob_url(upload_info['file_url'])
+            content_settings = ContentSettings(content_type=content_type or "application/octet-stream")
+
+            def upload():
+                with open_stream() as stream, track_upstream("blob_storage"):
+                    return upload_in_blocks(blob_client, stream, content_settings=content_settings,
+                                            block_size=block_size, total_size=stream_size(stream))
+            size, result[step] = with_retries(upload, retries, backoff)
+            result.update(status="uploaded", bytes=size)
+        except Exception as e:
+            result[step] = getattr(e, "attempts", 1)
+            result["error"] = str(e)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        if progress_callback:
+            with progress_lock:
+                progress_callback(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(upload_one, files))
+
+
+def find_files(paths, patterns=DEFAULT_PATTERNS):
+    """Returns the files matching the patterns, expanding the directories among the paths"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                    found.append(os.path.join(path, name))
+        else:
+            found.append(path)
+    return found
+
+
+# Uploads a folder of genetic reports, e.g. Samples_Rett, in one go
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload many patient files concurrently.")
+    parser.add_argument('paths', nargs='+', help="Files or folders to upload.")
+    parser.add_argument('--patient-id', type=str, required=True, help="Patient the files belong to.")
+    parser.add_argument('--file-type', type=str, default="genetic-report", help="Type of the files.")
+    parser.add_argument('--pattern', action='append', help="File name pattern used in folders (default: *.pdf and *.docx).")
+    parser.add_argument('--azure-function-url', type=str, default=os.getenv("AZURE_FUNCTION_URL"), help="Base URL of the Azure Function (default: $AZURE_FUNCTION_URL).")
+    parser.add_argument('--access-token', type=str, default=os.getenv("ACCESS_TOKEN"), help="Bearer token of the user (default: $ACCESS_TOKEN).")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help="Number of files uploaded at the same time.")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="Retries of each step after a network, throttling or server error.")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help="Block size of the uploads, in bytes.")
+    parser.add_argument('--report', type=str, help="Write the per-file results as JSON to this file.")
+    args = parser.parse_args()
+
+    if not args.azure_function_url or not args.access_token:
+        parser.error("--azure-function-url and --access-token (or AZURE_FUNCTION_URL and ACCESS_TOKEN) are required.")
+
+    paths = find_files(args.paths, args.pattern or DEFAULT_PATTERNS)
+    files = [
+        (os.path.basename(path), lambda path=path: open(path, "rb"), mimetypes.guess_type(path)[0])
+        for path in paths
+    ]
+
+    def print_result(result):
+        print(f"{result['status']:<9} {result['file_name']} ({result['bytes']} bytes, "
+              f"{result['info_attempts']}+{result['upload_attempts']} attempts)"
+              + (f": {result['error']}" if result.get('error') else ""))
+
+    start = time.perf_counter()
+    results = upload_batch(args.azure_function_url, args.access_token, args.patient_id, args.file_type, files,
+                           max_workers=args.workers, retries=args.retries, block_size=args.block_size,
+                           progress_callback=print_result)
+    elapsed = time.perf_counter() - start
+
+    uploaded = [result for result in results if result['status'] == "uploaded"]
+    print(f"{len(uploaded)} of {len(results)} files uploaded "
+          f"({sum(result['bytes'] for result in uploaded)} bytes) in {elapsed:.2f} s")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    if len(uploaded) != len(results):
+        exit(1)
@@ -0,0 +1,139 @@
+import argparse
+import base64
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobBlock, BlobClient, BlobServiceClient, ContentSettings
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Well-known development account of the Azurite storage emulator
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+
+def make_block_id(index):
+    # All the block IDs of a blob must have the same length
+    return base64.b64encode(f"block-{index:08d}".encode("utf-8")).decode("utf-8")
+
+
+def stream_size(stream):
+    """Returns the number of bytes left in a seekable stream, or None if it cannot be known"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def upload_in_blocks(blob_client, stream, content_settings=None, block_size=DEFAULT_BLOCK_SIZE,
+                     max_concurrency=DEFAULT_MAX_CONCURRENCY, progress_callback=None, total_size=None):
+    """
+    Upload a stream to a block blob, staging fixed-size blocks in parallel.
+    At most max_concurrency blocks are held in memory at any time.
+    Args:
+        blob_client (BlobClient): Client of the destination blob.
+        stream: Binary file-like object to read from.
+        content_settings (ContentSettings): Content settings of the committed blob.
+        block_size (int): Size in bytes of each staged block.
+        max_concurrency (int): Number of blocks staged at the same time.
+        progress_callback (callable): Called as progress_callback(uploaded_bytes, total_size) after each block.
+        total_size (int): Size of the stream if known, only used to report progress.
+    Returns:
+        int: Number of bytes uploaded.
+    """
+    if total_size is not None and total_size <= block_size:
+        # A single request is enough for small files
+        data = stream.read()
+        blob_client.upload_blob(data, blob_type="BlockBlob", content_settings=content_settings, overwrite=True)
+        if progress_callback:
+            progress_callback(len(data), total_size)
+        return len(data)
+
+    slots = threading.BoundedSemaphore(max_concurrency)
+    lock = threading.Lock()
+    failed = threading.Event()
+    block_ids = []
+    futures = []
+    uploaded = 0
+
+    def stage(block_id, chunk):
+        nonlocal uploaded
+        try:
+            blob_client.stage_block(block_id, chunk, length=len(chunk))
+            with lock:
+                uploaded += len(chunk)
+                if progress_callback:
+                    progress_callback(uploaded, total_size)
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while True:
+            # Wait for a free slot before reading, so memory stays bounded
+            slots.acquire()
+            if failed.is_set():
+                slots.release()
+                break
+            chunk = stream.read(block_size)
+            if not chunk:
+                slots.release()
+                break
+            block_id = make_block_id(len(block_ids))
+            block_ids.append(block_id)
+            futures.append(executor.submit(stage, block_id, chunk))
+
+    for future in futures:
+        future.result()
+
+    blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids],
+                                  content_settings=content_settings)
+    return uploaded
+
+
+# Usage example against a local storage emulator (Azurite) or a SAS URL
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload a file to Blob Storage in parallel blocks.")
+    parser.add_argument('file', type=str, help="Path to the file to upload.")
+    parser.add_argument('--blob-url', type=str, help="SAS URL of the destination blob. If missing, the file is uploaded with --connection-string.")
+    parser.add_argument('--connection-string', type=str, default=AZURITE_CONNECTION_STRING, help="Storage connection string (defaults to the Azurite emulator).")
+    parser.add_argument('--container', type=str, default="uploads", help="Container used with --connection-string.")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help="Block size in bytes.")
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY, help="Number of blocks uploaded in parallel.")
+    parser.add_argument('--content-type', type=str, default="application/octet-stream", help="Content type of the blob.")
+    args = parser.parse_args()
+
+    if args.blob_url:
+        blob_client = BlobClient.from_blob_url(args.blob_url)
+    else:
+        service_client = BlobServiceClient.from_connection_string(args.connection_string)
+        try:
+            service_client.create_container(args.container)
+        except ResourceExistsError:
+            pass
+        blob_client = service_client.get_blob_client(args.container, os.path.basename(args.file))
+
+    def print_progress(uploaded, total):
+        print(f"Uploaded {uploaded} of {total if total is not None else '?'} bytes")
+
+    with open(args.file, "rb") as f:
+        size = upload_in_blocks(
+            blob_client,
+            f,
+            content_settings=ContentSettings(content_type=args.content_type),
+            block_size=args.block_size,
+            max_concurrency=args.max_concurrency,
+            progress_callback=print_progress,
+            total_size=stream_size(f)
+        )
+    print(f"File uploaded to {blob_client.url} ({size} bytes)")
@@ -0,0 +1,213 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Bump when the extraction changes, so cached results are computed again
+EXTRACTOR_VERSION = 1
+DEFAULT_CACHE_DIR = ".extract_cache"
+
+# Genes associated with Rett syndrome and related disorders, looked up first
+KNOWN_GENES = ("MECP2", "CDKL5", "FOXG1", "STXBP1", "SCN2A", "SCN8A", "SYNGAP1", "TCF4", "MEF2C", "GRIN2B")
+GENE_CONTEXT = re.compile(r"\b(?:sobre|in|gen|gene)\s+(?:the\s+)?([A-Z][A-Z0-9]{2,9})\b(?!\s*\()")
+# cDNA changes in HGVS notation, tolerating the stray spaces of PDF text (c. 916C>T, c.229 T>C...)
+CDNA_VARIANT = re.compile(
+    r"\bc\.\s?(\d+(?:[+-]\d+)?(?:_\d+(?:[+-]\d+)?)?)\s?"
+    r"(?:([ACGT])\s?>\s?([ACGT])|(del|dup)([ACGT]*)|(ins)([ACGT]+))"
+)
+PROTEIN_VARIANT = re.compile(r"\bp\.\s?\(?([A-Z][a-z]{2})\s?(\d[\d ]{0,5}?)\s?([A-Z][a-z]{2}|\*|fs)\)?")
+
+STOPWORDS = {
+    "es": {"de", "la", "el", "en", "que", "del", "se", "los", "las", "por", "una", "con", "para", "sobre"},
+    "en": {"the", "and", "of", "in", "is", "for", "this", "to", "with", "was", "has", "be", "which", "by"},
+}
+FILE_NAME_LANGUAGE = re.compile(r"_([a-z]{2})\.[^.]+$")
+REPORT_EXTENSIONS = (".pdf", ".docx")
+
+
+def find_reports(paths):
+    """Returns the PDF and DOCX files among the paths, expanding the directories"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(REPORT_EXTENSIONS))
+        else:
+            found.append(path)
+    return found
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_text(path):
+    """Returns the text of a PDF or DOCX file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        from pypdf import PdfReader
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    if extension == ".docx":
+        from docx import Document
+        document = Document(path)
+        lines = [paragraph.text for paragraph in document.paragraphs]
+        for table in document.tables:
+            for row in table.rows:
+                lines.append(" ".join(cell.text for cell in row.cells))
+        return "\n".join(lines)
+    raise ValueError(f"Unsupported file type: {extension}")
+
+
+def find_gene(text):
+    found = [gene for gene in KNOWN_GENES if re.search(rf"\b{gene}\b", text)]
+    if found:
+        return max(found, key=lambda gene: len(re.findall(rf"\b{gene}\b", text)))
+    candidates = GENE_CONTEXT.findall(text)
+    return max(set(candidates), key=candidates.count) if candidates else None
+
+
+def find_variants(text):
+    """Returns the distinct cDNA changes of the text, normalized (e.g. c.916C>T), in order of appearance"""
+    variants = []
+    for match in CDNA_VARIANT.finditer(text):
+        position, ref, alt, deldup, deldup_bases, ins, ins_bases = match.groups()
+        if ref:
+            variant = f"c.{position}{ref}>{alt}"
+        elif deldup:
+            variant = f"c.{position}{deldup}{deldup_bases}"
+        else:
+            variant = f"c.{position}{ins}{ins_bases}"
+        if variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+def find_protein_changes(text):
+    changes = []
+    for ref, position, alt in PROTEIN_VARIANT.findall(text):
+        change = f"p.{ref}{position.replace(' ', '')}{alt}"
+        if change not in changes:
+            changes.append(change)
+    return changes
+
+
+def detect_language(text, file_name):
+    """Guess the report language from stopwords, falling back to the _xx suffix of the file name"""
+    words = re.findall(r"[a-záéíóúñ]+", text.lower())
+    scores = {language: sum(word in stopwords for word in words) for language, stopwords in STOPWORDS.items()}
+    best = max(scores, key=scores.get)
+    if scores[best] > 0 and list(scores.values()).count(scores[best]) == 1:
+        return best
+    match = FILE_NAME_LANGUAGE.search(file_name)
+    return match.group(1) if match else None
+
+
+def extract_report(path):
+    """
+    Extract the text and the key fields of a genetic report. Runs in a worker process.
+    Args:
+        path (str): Path of the PDF or DOCX report.
+    Returns:
+        dict: Extracted fields (file, format, language, gene, variant, variants, protein_changes, text).
+    """
+    text = extract_text(path)
+    variants = find_variants(text)
+    return {
+        "file": os.path.basename(path),
+        "format": os.path.splitext(path)[1].lower().lstrip("."),
+        "language": detect_language(text, os.path.basename(path)),
+        "gene": find_gene(text),
+        "variant": variants[0] if variants else None,
+        "variants": variants,
+        "protein_changes": find_protein_changes(text),
+        "text": text,
+    }
+
+
+def cache_path(cache_dir, sha256):
+    return os.path.join(cache_dir, f"{sha256}.v{EXTRACTOR_VERSION}.json")
+
+
+def extract_reports(paths, cache_dir=DEFAULT_CACHE_DIR, max_workers=None):
+    """
+    Extract many reports with a process pool, reusing the cached results of unchanged files.
+    Args:
+        paths (list): Paths of the reports.
+        cache_dir (str): Directory of the results cached by content hash, or None to disable the cache.
+        max_workers (int): Number of worker processes (default: number of CPUs).
+    Returns:
+        tuple: (list of results in the order of paths, dict with the extracted/cached/failed counts).
+    """
+    results = [None] * len(paths)
+    hashes = [None] * len(paths)
+    pending = []
+    counts = {"extracted": 0, "cached": 0, "failed": 0}
+
+    for index, path in enumerate(paths):
+        try:
+            sha256 = hashes[index] = file_sha256(path)
+        except Exception as e:
+            # A missing or unreadable file is reported like a failed extraction
+            results[index] = {"file": os.path.basename(path), "error": str(e)}
+            counts["failed"] += 1
+            continue
+        cached = cache_dir and cache_path(cache_dir, sha256)
+        if cached and os.path.exists(cached):
+            with open(cached, encoding="utf-8") as f:
+                results[index] = {**json.load(f), "file": os.path.basename(path), "sha256": sha256}
+            counts["cached"] += 1
+        else:
+            pending.append(index)
+
+    if pending:
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {index: executor.submit(extract_report, paths[index]) for index in pending}
+            for index, future in futures.items():
+                try:
+                    result = {**future.result(), "sha256": hashes[index]}
+                except Exception as e:
+                    results[index] = {"file": os.path.basename(paths[index]), "sha256": hashes[index], "error": str(e)}
+                    counts["failed"] += 1
+                    continue
+                results[index] = result
+                counts["extracted"] += 1
+                if cache_dir:
+                    with open(cache_path(cache_dir, hashes[index]), "w", encoding="utf-8") as f:
+                        json.dump(result, f, ensure_ascii=False)
+
+    return results, counts
+
+
+# Extracts the sample reports, e.g. python extract_reports.py Samples_Rett --output reports.jsonl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract text and key fields from genetic reports (PDF and DOCX).")
+    parser.add_argument('paths', nargs='+', help="Reports or folders of reports.")
+    parser.add_argument('--output', type=str, default="reports.jsonl", help="JSON lines file to write the results to.")
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR, help="Directory of the cached results.")
+    parser.add_argument('--no-cache', action='store_true', help="Extract every file, ignoring the cache.")
+    parser.add_argument('--workers', type=int, help="Number of worker processes (default: number of CPUs).")
+    parser.add_argument('--no-text', action='store_true', help="Leave the full text out of the output.")
+    args = parser.parse_args()
+
+    paths = find_reports(args.paths)
+    start = time.perf_counter()
+    results, counts = extract_reports(paths, None if args.no_cache else args.cache_dir, args.workers)
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for result in results:
+            if args.no_text:
+                result.pop("text", None)
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    print(f"{len(results)} reports in {elapsed:.2f} s: {counts['extracted']} extracted, "
+          f"{counts['cached']} cached, {counts['failed']} failed. Results written to {args.output}")
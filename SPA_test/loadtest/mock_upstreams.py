@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# Blob URLs of the mock use the path-style addressing of the storage emulators
+BLOB_ACCOUNT = "devstoreaccount1"
+BLOB_CONTAINER = "patient-files"
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    """Base handler of the mock services: injects latency and writes JSON responses"""
+    protocol_version = "HTTP/1.1"
+    service = None  # Set by MockServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def inject_latency(self):
+        latency = self.service.latency
+        if self.service.jitter:
+            latency += random.uniform(0, self.service.jitter)
+        if latency > 0:
+            time.sleep(latency)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, status, document, headers=None):
+        body = json.dumps(document).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_empty(self, status, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+
+class MockAuth0:
+    def __init__(self, audience, client_id, latency=0.0, jitter=0.0):
+        """
+        Stand-in for Auth0: authorization code flow, JWKS, and /userinfo.
+        Tokens are signed with an RSA key generated at startup, so the app can verify them locally.
+        Args:
+            audience (str): Audience of the access tokens.
+            client_id (str): Client ID, audience of the ID tokens.
+            latency (float): Seconds added to every response.
+            jitter (float): Maximum random seconds added on top of latency.
+        """
+        self.audience = audience
+        self.client_id = client_id
+        self.latency = latency
+        self.jitter = jitter
+        self.issuer = None  # Known once the server is listening
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.kid = uuid.uuid4().hex
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        jwk.update(kid=self.kid, use="sig", alg="RS256")
+        self.jwks = {"keys": [jwk]}
+        self.codes = {}
+        self.lock = threading.Lock()
+
+    def issue_tokens(self, subject):
+        now = int(time.time())
+        profile = {
+            "name": f"{subject}@rettx.test",
+            "nickname": subject,
+            "email": f"{subject}@rettx.test",
+            "email_verified": True,
+            "picture": "https://rettx.eu/wp-content/uploads/2024/11/rettX-1.svg",
+        }
+        common = {"iss": self.issuer, "sub": f"auth0|{subject}", "iat": now, "exp": now + 3600}
+        headers = {"kid": self.kid}
+        access_token = jwt.encode({**common, "aud": self.audience, "scope": "openid profile email"},
+                                  self.private_key, algorithm="RS256", headers=headers)
+        id_token = jwt.encode({**common, **profile, "aud": self.client_id},
+                              self.private_key, algorithm="RS256", headers=headers)
+        return {"access_token": access_token, "id_token": id_token, "token_type": "Bearer", "expires_in": 3600}
+
+    def handler(self):
+        auth0 = self
+
+        class Auth0Handler(UpstreamHandler):
+            service = auth0
+
+            def do_GET(self):
+                self.inject_latency()
+                url = urlparse(self.path)
+                if url.path == "/authorize":
+                    query = parse_qs(url.query)
+                    code = uuid.uuid4().hex
+                    with auth0.lock:
+                        auth0.codes[code] = f"user-{code[:8]}"
+                    location = f"{query['redirect_uri'][0]}?{urlencode({'code': code})}"
+                    self.send_empty(302, {"Location": location})
+                elif url.path == "/.well-known/jwks.json":
+                    self.send_json(200, auth0.jwks)
+                elif url.path == "/userinfo":
+                    token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+                    claims = jwt.decode(token, options={"verify_signature": False})
+                    self.send_json(200, {"sub": claims.get("sub"), "email": f"{claims.get('sub')}@rettx.test"})
+                else:
+                    self.send_json(404, {"error": "not_found"})
+
+            def do_POST(self):
+                payload = json.loads(self.read_body() or b"{}")
+                self.inject_latency()
+                if urlparse(self.path).path != "/oauth/token":
+                    self.send_json(404, {"error": "not_found"})
+                    return
+                with auth0.lock:
+                    subject = auth0.codes.pop(payload.get("code"), None)
+                if subject is None:
+                    self.send_json(403, {"error": "invalid_grant"})
+                    return
+                self.send_json(200, auth0.issue_tokens(subject))
+
+        return Auth0Handler
+
+
+class MockAzureFunction:
+    def __init__(self, blob_base_url=None, patient_count=20, latency=0.0, jitter=0.0):
+        """
+        Stand-in for the registry Azure Function: user profile, patients and upload info.
+        Args:
+            blob_base_url (str): Base URL of the mock Blob Storage used in the upload URLs.
+            patient_count (int): Number of patients returned by /patients.
+            latency (float): Seconds added to every response.
+            jitter (float): Maximum random seconds added on top of latency.
+        """
+        self.blob_base_url = blob_base_url
+        self.latency = latency
+        self.jitter = jitter
+        self.profile = {
+            "name": "Peter Rock",
+            "nickname": "perico",
+            "user_metadata": {"city": "Toledo", "country": "ES", "region": "Castilla-La Mancha"}
+        }
+        self.patients = [
+            {"id": str(uuid.UUID(int=index)), "given_name": f"Patient {index}", "gender": "Female",
+             "birth_date": "2015-01-01", "country": "ES"}
+            for index in range(patient_count)
+        ]
+        self.patients_etag = '"' + hashlib.sha256(json.dumps(self.patients).encode("utf-8")).hexdigest()[:16] + '"'
+
+    def handler(self):
+        function = self
+
+        class AzureFunctionHandler(UpstreamHandler):
+            service = function
+
+            def do_GET(self):
+                self.inject_latency()
+                path = urlparse(self.path).path
+                if path == "/user/profile":
+                    self.send_json(200, function.profile)
+                elif path == "/patients":
+                    if self.headers.get("If-None-Match") == function.patients_etag:
+                        self.send_empty(304, {"ETag": function.patients_etag})
+                    else:
+                        self.send_json(200, function.patients, {"ETag": function.patients_etag})
+                else:
+                    self.send_json(404, {"error": "not_found"})
+
+            def do_PATCH(self):
+                update = json.loads(self.read_body() or b"{}")
+                self.inject_latency()
+                if urlparse(self.path).path == "/user/profile":
+                    self.send_json(200, {**function.profile, **update})
+                else:
+                    self.send_json(404, {"error": "not_found"})
+
+            def do_POST(self):
+                self.read_body()
+                self.inject_latency()
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                # POST /patients/{id}/files/upload-file-info?file_name=...&file_type=...
+                if len(parts) == 4 and parts[0] == "patients" and parts[2:] == ["files", "upload-file-info"]:
+                    query = parse_qs(url.query)
+                    file_id = uuid.uuid4().hex
+                    file_name = query.get("file_name", ["file"])[0]
+                    sas = urlencode({"sv": "2023-11-03", "se": "2099-01-01T00:00:00Z", "sp": "cw", "sig": "mock"})
+                    self.send_json(200, {
+                        "file_url": f"{function.blob_base_url}/{BLOB_ACCOUNT}/{BLOB_CONTAINER}/{parts[1]}/{file_id}/{file_name}?{sas}",
+                        "file_id": file_id,
+                        "patient_id": parts[1],
+                        "expiration": "2099-01-01T00:00:00Z"
+                    })
+                else:
+                    self.send_json(404, {"error": "not_found"})
+
+        return AzureFunctionHandler
+
+
+class MockBlobStorage:
+    def __init__(self, latency=0.0, jitter=0.0):
+        """
+        Stand-in for Blob Storage supporting Put Blob, Put Block and Put Block List.
+        Uploaded data is counted and discarded.
+        Args:
+            latency (float): Seconds added to every response.
+            jitter (float): Maximum random seconds added on top of latency.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.bytes_received = 0
+        self.blobs_committed = 0
+        self.lock = threading.Lock()
+
+    def handler(self):
+        storage = self
+
+        class BlobHandler(UpstreamHandler):
+            service = storage
+
+            def do_PUT(self):
+                body = self.read_body()
+                self.inject_latency()
+                comp = parse_qs(urlparse(self.path).query).get("comp", [None])[0]
+                with storage.lock:
+                    storage.bytes_received += len(body)
+                    if comp in (None, "blocklist"):
+                        storage.blobs_committed += 1
+                headers = {
+                    "ETag": f'"0x{uuid.uuid4().hex[:16].upper()}"',
+                    "Last-Modified": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime()),
+                    "x-ms-request-id": str(uuid.uuid4()),
+                    "x-ms-version": "2023-11-03",
+                    "x-ms-request-server-encrypted": "true",
+                }
+                self.send_empty(201, headers)
+
+        return BlobHandler
+
+
+class MockServer:
+    def __init__(self, service, host="127.0.0.1", port=0):
+        """
+        Serve a mock service on a background thread.
+        Args:
+            service: MockAuth0, MockAzureFunction or MockBlobStorage.
+            host (str): Interface to listen on.
+            port (int): Port to listen on, 0 to pick a free one.
+        """
+        self.service = service
+        self.server = ThreadingHTTPServer((host, port), service.handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_mock_upstreams(audience, client_id, latency=0.0, jitter=0.0, patient_count=20, host="127.0.0.1"):
+    """
+    Start the three mock services.
+    Returns:
+        dict: MockServer of "auth0", "azure_function" and "blob_storage".
+    """
+    blob = MockServer(MockBlobStorage(latency, jitter), host).start()
+    function = MockServer(MockAzureFunction(blob.url, patient_count, latency, jitter), host).start()
+    auth0_service = MockAuth0(audience, client_id, latency, jitter)
+    auth0 = MockServer(auth0_service, host).start()
+    auth0_service.issuer = f"{auth0.url}/"
+    return {"auth0": auth0, "azure_function": function, "blob_storage": blob}
+
+
+# Runs the mock services on their own, e.g. to try the app by hand
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run local stand-ins of Auth0, the Azure Function and Blob Storage.")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every upstream response.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum random seconds added on top of the latency.")
+    parser.add_argument('--patients', type=int, default=20, help="Number of patients returned by /patients.")
+    parser.add_argument('--audience', type=str, default="https://api.rettx.test/", help="Audience of the access tokens.")
+    parser.add_argument('--client-id', type=str, default="loadtest-client", help="Client ID, audience of the ID tokens.")
+    args = parser.parse_args()
+
+    servers = start_mock_upstreams(args.audience, args.client_id, args.latency, args.jitter, args.patients)
+    print(f"AUTH0_BASE_URL={servers['auth0'].url}")
+    print(f"AUTH0_ISSUER={servers['auth0'].url}/")
+    print(f"LOCAL_AZURE_FUNCTION_URL={servers['azure_function'].url}")
+    print(f"Blob Storage: {servers['blob_storage'].url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.stop()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from mock_upstreams import start_mock_upstreams
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_UPLOAD_FILE = os.path.join(os.path.dirname(LOADTEST_DIR), "Samples_Rett", "GeneticReport3_es.pdf")
+STEPS = ("login", "user_profile", "patients", "get_upload_url", "upload_file")
+AUDIENCE = "https://api.rettx.test/"
+CLIENT_ID = "loadtest-client"
+
+
+class StepStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, step, duration, ok):
+        with self.lock:
+            self.durations[step].append(duration)
+            if not ok:
+                self.errors[step] += 1
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(port, upstreams, log_level, upload_block_size):
+    """Start app-simulation.py in its own process, pointed to the mock services"""
+    app_url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        AUTH0_DOMAIN="auth0.mock",
+        AUTH0_BASE_URL=upstreams["auth0"].url,
+        AUTH0_ISSUER=f"{upstreams['auth0'].url}/",
+        AUTH0_AUDIENCE=AUDIENCE,
+        AUTH0_CLIENT_ID=CLIENT_ID,
+        AUTH0_CLIENT_SECRET="loadtest-secret",
+        AUTH0_CALLBACK_URL=f"{app_url}/callback",
+        LOCAL_AZURE_FUNCTION_URL=upstreams["azure_function"].url,
+        LOG_LEVEL=log_level,
+        UPLOAD_BLOCK_SIZE=str(upload_block_size),
+    )
+    process = subprocess.Popen([sys.executable, os.path.join(LOADTEST_DIR, "serve_app.py"), "--port", str(port)], env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{app_url}/metrics", timeout=1)
+            return process, app_url
+        except requests.exceptions.ConnectionError:
+            if process.poll() is not None:
+                raise RuntimeError("The app exited before it was ready.")
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The app did not start in time.")
+
+
+def timed(stats, step, call):
+    start = time.perf_counter()
+    try:
+        response = call()
+        ok = response.status_code < 400
+    except requests.exceptions.RequestException:
+        ok = False
+    stats.record(step, time.perf_counter() - start, ok)
+    return ok
+
+
+def redirect_location(response):
+    """The target of a redirect; any other response (an error page, a missing Location) fails the login step"""
+    if not response.is_redirect:
+        raise requests.exceptions.HTTPError(f"Expected a redirect from {response.url}, got {response.status_code}", response=response)
+    return response.headers["Location"]
+
+
+def login(http, app_url):
+    # /login redirects to the Auth0 stand-in, which redirects back to /callback with a code
+    response = http.get(f"{app_url}/login", allow_redirects=False)
+    response = http.get(redirect_location(response), allow_redirects=False)
+    return http.get(redirect_location(response))
+
+
+def run_session(app_url, iterations, upload_name, upload_data, stats):
+    """One virtual user: logs in, reads its profile and patients, and uploads a report, iterations times"""
+    http = requests.Session()
+    for iteration in range(iterations):
+        http.cookies.clear()
+        if not timed(stats, "login", lambda: login(http, app_url)):
+            continue
+        timed(stats, "user_profile", lambda: http.get(f"{app_url}/user/profile"))
+        timed(stats, "patients", lambda: http.get(f"{app_url}/patients"))
+        form = {"patient_id": "loadtest-patient", "file_name": upload_name, "file_type": "genetic-report"}
+        if timed(stats, "get_upload_url", lambda: http.post(f"{app_url}/get-upload-url", data=form)):
+            files = {"file": (upload_name, upload_data, "application/pdf")}
+            timed(stats, "upload_file", lambda: http.post(f"{app_url}/upload-file", files=files))
+
+
+def build_report(stats, elapsed, sessions, iterations, app_metrics):
+    steps = {}
+    total_requests = 0
+    for step in STEPS:
+        durations = sorted(stats.durations.get(step, []))
+        total_requests += len(durations)
+        steps[step] = {
+            "requests": len(durations),
+            "errors": stats.errors.get(step, 0),
+            "throughput_per_second": round(len(durations) / elapsed, 2),
+            **{f"p{int(q * 100)}_ms": round(percentile(durations, q) * 1000, 2) if durations else None
+               for q in (0.5, 0.9, 0.99)},
+            "max_ms": round(durations[-1] * 1000, 2) if durations else None,
+        }
+    return {
+        "sessions": sessions,
+        "iterations": iterations,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": total_requests,
+        "throughput_per_second": round(total_requests / elapsed, 2),
+        "steps": steps,
+        "upstreams": app_metrics.get("upstreams", {}),
+    }
+
+
+def print_report(report):
+    print(f"\n{report['sessions']} sessions x {report['iterations']} iterations in {report['elapsed_seconds']} s: "
+          f"{report['requests']} requests, {report['throughput_per_second']} requests/s")
+    print(f"\n{'Step':<16}{'Requests':>10}{'Errors':>8}{'Req/s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'Max ms':>10}")
+    for step, row in report["steps"].items():
+        print(f"{step:<16}{row['requests']:>10}{row['errors']:>8}{row['throughput_per_second']:>9}"
+              f"{str(row['p50_ms']):>10}{str(row['p90_ms']):>10}{str(row['p99_ms']):>10}{str(row['max_ms']):>10}")
+    if report["upstreams"]:
+        print(f"\n{'Upstream':<16}{'Calls':>10}{'p50 ms':>10}{'p99 ms':>10}  Status")
+        for upstream, row in report["upstreams"].items():
+            latency = row["latency_seconds"]
+            p50 = round(latency["p50"] * 1000, 2) if latency["p50"] is not None else None
+            p99 = round(latency["p99"] * 1000, 2) if latency["p99"] is not None else None
+            print(f"{upstream:<16}{latency['count']:>10}{str(p50):>10}{str(p99):>10}  {row['status']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test app-simulation.py against local stand-ins of its upstream services.")
+    parser.add_argument('--sessions', type=int, default=10, help="Number of concurrent sessions.")
+    parser.add_argument('--iterations', type=int, default=5, help="Login/profile/patients/upload cycles per session.")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds injected in every upstream response.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum random seconds added on top of the latency.")
+    parser.add_argument('--patients', type=int, default=20, help="Number of patients returned by the Azure Function stand-in.")
+    parser.add_argument('--upload-file', type=str, default=DEFAULT_UPLOAD_FILE, help="File uploaded by each session.")
+    parser.add_argument('--upload-block-size', type=int, default=4 * 1024 * 1024, help="Block size of the app uploads, in bytes.")
+    parser.add_argument('--app-log-level', type=str, default="WARNING", help="LOG_LEVEL of the app.")
+    parser.add_argument('--output', type=str, help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    with open(args.upload_file, "rb") as f:
+        upload_data = f.read()
+    upload_name = os.path.basename(args.upload_file)
+
+    upstreams = start_mock_upstreams(AUDIENCE, CLIENT_ID, args.latency, args.jitter, args.patients)
+    process, app_url = start_app(free_port(), upstreams, args.app_log_level, args.upload_block_size)
+    try:
+        stats = StepStats()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            sessions = [executor.submit(run_session, app_url, args.iterations, upload_name, upload_data, stats)
+                        for _ in range(args.sessions)]
+            for session in sessions:
+                session.result()
+        elapsed = time.perf_counter() - start
+        report = build_report(stats, elapsed, args.sessions, args.iterations, requests.get(f"{app_url}/metrics").json())
+    finally:
+        process.terminate()
+        process.wait()
+        for server in upstreams.values():
+            server.stop()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
@@ -0,0 +1,36 @@
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+from werkzeug.serving import make_server
+
+SPA_TEST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(azure_function_url):
+    """
+    Import app-simulation.py as a module and point it to the given Azure Function.
+    The Auth0 settings are read from the environment when the module is imported.
+    """
+    sys.path.insert(0, SPA_TEST_DIR)
+    spec = importlib.util.spec_from_file_location("app_simulation", os.path.join(SPA_TEST_DIR, "app-simulation.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.AZURE_FUNCTION_URL = azure_function_url
+    return module.app
+
+
+# Serves the app with a threaded server and without the debug reloader, as the load test needs
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve app-simulation.py for load tests.")
+    parser.add_argument('--host', type=str, default="127.0.0.1", help="Interface to listen on.")
+    parser.add_argument('--port', type=int, default=3000, help="Port to listen on.")
+    args = parser.parse_args()
+
+    app = load_app(os.getenv("LOCAL_AZURE_FUNCTION_URL"))
+    # One access log line per request would dominate the measurements
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(args.host, args.port, app, threaded=True)
+    print(f"Serving app-simulation.py on http://{args.host}:{args.port}", flush=True)
+    server.serve_forever()
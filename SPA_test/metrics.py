@@ -0,0 +1,193 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import g, request
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Latency histogram with fixed buckets, cheap to update and of constant size.
+        Args:
+            buckets (tuple): Sorted upper bounds of the buckets; an overflow bucket is added after the last one.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside the bucket that contains it.
+        Args:
+            q (float): Quantile between 0 and 1.
+        Returns:
+            float: Estimated value, or None if nothing was observed.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def summary(self):
+        summary = {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6)}
+        for q in QUANTILES:
+            value = self.quantile(q)
+            summary[f"p{int(q * 100)}"] = round(value, 6) if value is not None else None
+        return summary
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Request and upstream latency metrics of the app, shared by all the worker threads.
+        Args:
+            buckets (tuple): Upper bounds of the latency buckets, in seconds.
+        """
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.route_latency = defaultdict(lambda: Histogram(self.buckets))
+        self.route_status = defaultdict(int)
+        self.upstream_latency = defaultdict(lambda: Histogram(self.buckets))
+        self.upstream_status = defaultdict(int)
+
+    def request_started(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def request_finished(self, route, method, status, duration):
+        with self.lock:
+            self.in_flight -= 1
+            self.route_latency[(method, route)].observe(duration)
+            self.route_status[(method, route, status)] += 1
+
+    def upstream_finished(self, upstream, status, duration):
+        with self.lock:
+            self.upstream_latency[upstream].observe(duration)
+            self.upstream_status[(upstream, status)] += 1
+
+    @contextmanager
+    def track_upstream(self, upstream):
+        """
+        Time a call to an upstream service.
+        The caller sets the status of the yielded call, e.g. call.status = response.status_code;
+        calls that raise are counted with status "error".
+        Args:
+            upstream (str): Name of the upstream service (e.g. "auth0", "azure_function", "blob_storage").
+        """
+        call = UpstreamCall()
+        start = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            call.status = "error"
+            raise
+        finally:
+            self.upstream_finished(upstream, str(call.status), time.perf_counter() - start)
+
+    def snapshot(self):
+        """Returns the metrics as a dictionary with estimated latency percentiles"""
+        with self.lock:
+            routes = defaultdict(lambda: {"status": {}})
+            for (method, route), histogram in self.route_latency.items():
+                routes[f"{method} {route}"]["latency_seconds"] = histogram.summary()
+            for (method, route, status), count in self.route_status.items():
+                routes[f"{method} {route}"]["status"][str(status)] = count
+            upstreams = defaultdict(lambda: {"status": {}})
+            for upstream, histogram in self.upstream_latency.items():
+                upstreams[upstream]["latency_seconds"] = histogram.summary()
+            for (upstream, status), count in self.upstream_status.items():
+                upstreams[upstream]["status"][status] = count
+            return {"in_flight": self.in_flight, "routes": dict(routes), "upstreams": dict(upstreams)}
+
+    def render_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            lines.append("# TYPE http_requests_in_flight gauge")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (method, route), histogram in self.route_latency.items():
+                lines.extend(render_histogram("http_request_duration_seconds", f'method="{method}",route="{route}"', histogram))
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in self.route_status.items():
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            lines.append("# TYPE upstream_request_duration_seconds histogram")
+            for upstream, histogram in self.upstream_latency.items():
+                lines.extend(render_histogram("upstream_request_duration_seconds", f'upstream="{upstream}"', histogram))
+            lines.append("# TYPE upstream_requests_total counter")
+            for (upstream, status), count in self.upstream_status.items():
+                lines.append(f'upstream_requests_total{{upstream="{upstream}",status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class UpstreamCall:
+    def __init__(self):
+        self.status = "ok"
+
+
+def render_histogram(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def init_app(app, metrics):
+    """
+    Register the request hooks that record the latency, status and in-flight count of every route.
+    Latency is measured until the response body has been sent, so streamed responses are fully counted.
+    Requests that end with an unhandled exception are recorded as 500 by the teardown hook, which always runs,
+    even in debug mode where after_request is skipped.
+    """
+    def route_of_request():
+        return request.url_rule.rule if request.url_rule else "unmatched"
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        metrics.request_started()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        route = route_of_request()
+        method = request.method
+        status = response.status_code
+        response.call_on_close(lambda: metrics.request_finished(route, method, status, time.perf_counter() - start))
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exception):
+        # Still set only when after_request did not run, i.e. the request raised
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            metrics.request_finished(route_of_request(), request.method, 500, time.perf_counter() - start)
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedResponse:
+    def __init__(self, body, content_type, etag, expires_at):
+        """
+        Upstream response body kept by the ResponseCache.
+        Args:
+            body (bytes): Raw response body.
+            content_type (str): Content type returned by the upstream service.
+            etag (str): ETag returned by the upstream service, or None.
+            expires_at (float): Monotonic time after which the entry must be revalidated.
+        """
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.expires_at = expires_at
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires_at
+
+
+class ResponseCache:
+    def __init__(self, ttl=30, max_entries=1024):
+        """
+        TTL cache of upstream responses keyed by access token and route, with LRU eviction.
+        Args:
+            ttl (float): Seconds an entry is served without asking the upstream service.
+            max_entries (int): Maximum number of entries kept; the least recently used is evicted.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(access_token, route):
+        # Tokens are hashed so the cache never keeps them in memory in clear text
+        return (hashlib.sha256(access_token.encode("utf-8")).hexdigest(), route)
+
+    def get(self, access_token, route):
+        """
+        Retrieve the entry for a token and route, fresh or stale.
+        Args:
+            access_token (str): Bearer token of the session.
+            route (str): Route the response belongs to.
+        Returns:
+            CachedResponse: The entry, or None if there is none. Stale entries are
+            returned so their ETag can be used to revalidate them.
+        """
+        key = self.make_key(access_token, route)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, access_token, route, body, content_type, etag=None):
+        """
+        Store a response, evicting the least recently used entries above max_entries.
+        Returns:
+            CachedResponse: The stored entry.
+        """
+        key = self.make_key(access_token, route)
+        entry = CachedResponse(body, content_type, etag, time.monotonic() + self.ttl)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def refresh(self, access_token, route):
+        """
+        Extend the lifetime of an entry after the upstream service confirmed it (304 Not Modified).
+        Returns:
+            CachedResponse: The refreshed entry, or None if it was evicted meanwhile.
+        """
+        key = self.make_key(access_token, route)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.expires_at = time.monotonic() + self.ttl
+                self.entries.move_to_end(key)
+            return entry
+
+    def invalidate(self, access_token, route=None):
+        """
+        Drop the entries of a token, either for one route or for all of them.
+        Args:
+            access_token (str): Bearer token of the session.
+            route (str): Route to invalidate, or None to invalidate every route of the token.
+        """
+        token_hash, _ = self.make_key(access_token, route or "")
+        with self.lock:
+            if route is not None:
+                self.entries.pop((token_hash, route), None)
+                return
+            for key in [key for key in self.entries if key[0] == token_hash]:
+                del self.entries[key]
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+import jwt
+import requests
+
+logger = logging.getLogger(__name__)
+
+# OpenID Connect standard claims served from a verified ID token
+STANDARD_CLAIMS = (
+    "sub", "name", "given_name", "family_name", "nickname", "email", "email_verified",
+    "picture", "locale", "updated_at"
+)
+
+
+class TokenValidationError(Exception):
+    pass
+
+
+class JWKSCache:
+    def __init__(self, jwks_url, refresh_interval=3600, min_refresh_interval=60, timeout=5):
+        """
+        Signing keys of the identity provider, fetched from its JWKS endpoint and refreshed periodically.
+        Args:
+            jwks_url (str): URL of the JWKS document (e.g. https://<domain>/.well-known/jwks.json).
+            refresh_interval (float): Seconds after which the key set is fetched again.
+            min_refresh_interval (float): Minimum seconds between two fetches triggered by an unknown key ID,
+                so tokens with a bogus kid cannot make us hammer the identity provider. Also the wait
+                before fetching again after a failed fetch.
+            timeout (float): Timeout in seconds of the JWKS request.
+        """
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.keys = {}
+        self.fetched_at = None
+        # No fetch before this time, after a failed one
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Fetch the key set, replacing the cached keys"""
+        response = requests.get(self.jwks_url, timeout=self.timeout)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            if jwk.get("use", "sig") != "sig" or "kid" not in jwk:
+                continue
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk)
+            except jwt.exceptions.PyJWKError:
+                continue  # Skip keys of unsupported types
+        self.keys = keys
+        self.fetched_at = time.monotonic()
+
+    def get_key(self, kid):
+        """
+        Retrieve the signing key with the given key ID.
+        An unknown key ID triggers a refresh, to pick up keys rotated in by the identity provider.
+        If a fetch fails, the cached keys are kept and no new fetch is made for min_refresh_interval seconds,
+        so an outage of the identity provider neither rejects valid tokens nor stalls every request.
+        Args:
+            kid (str): Key ID from the token header.
+        Returns:
+            PyJWK: The signing key.
+        Raises:
+            TokenValidationError: If no key with this ID is published, or no key could ever be fetched.
+        """
+        with self.lock:
+            now = time.monotonic()
+            stale = self.fetched_at is None or now - self.fetched_at >= self.refresh_interval
+            unknown = kid not in self.keys and (self.fetched_at is None or now - self.fetched_at >= self.min_refresh_interval)
+            if (stale or unknown) and now >= self.retry_at:
+                try:
+                    self.refresh()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    self.retry_at = now + self.min_refresh_interval
+                    if self.fetched_at is None:
+                        raise TokenValidationError(f"Could not fetch signing keys: {e}") from e
+                    logger.warning("Could not fetch signing keys, using the cached ones: %s", e)
+            if self.fetched_at is None:
+                raise TokenValidationError("Signing keys are not available yet")
+            key = self.keys.get(kid)
+        if key is None:
+            raise TokenValidationError(f"Unknown signing key: {kid}")
+        return key
+
+
+class TokenValidator:
+    def __init__(self, jwks_cache, issuer, algorithms=("RS256",), leeway=30):
+        """
+        Verify tokens issued by Auth0 locally, without calling Auth0.
+        Args:
+            jwks_cache (JWKSCache): Signing keys of the issuer.
+            issuer (str): Expected "iss" claim (e.g. https://<domain>/).
+            algorithms (tuple): Accepted signing algorithms.
+            leeway (int): Clock skew tolerated when checking "exp", "iat" and "nbf", in seconds.
+        """
+        self.jwks_cache = jwks_cache
+        self.issuer = issuer
+        self.algorithms = list(algorithms)
+        self.leeway = leeway
+
+    def verify(self, token, audience):
+        """
+        Verify the signature and the standard claims of a token.
+        Args:
+            token (str): Encoded JWT.
+            audience (str): Expected "aud" claim (the API audience for access tokens, the client ID for ID tokens).
+        Returns:
+            dict: Claims of the token.
+        Raises:
+            TokenValidationError: If the token is malformed, expired, or not issued for this audience.
+        """
+        try:
+            header = jwt.get_unverified_header(token)
+            key = self.jwks_cache.get_key(header.get("kid"))
+            return jwt.decode(
+                token,
+                key.key,
+                algorithms=self.algorithms,
+                audience=audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={"require": ["exp", "iat", "sub"]}
+            )
+        except jwt.exceptions.InvalidTokenError as e:
+            raise TokenValidationError(str(e)) from e
+
+
+def standard_claims(claims):
+    """Returns the OpenID Connect standard claims found in a set of claims"""
+    return {name: claims[name] for name in STANDARD_CLAIMS if name in claims}
@@ -1,4 +1,6 @@
 import argparse
+import os
+import sys
 import pandas as pd
 import logging
 from manager import PatientContactManager
@@ -15,7 +17,12 @@ logger = logging.getLogger()
 parser = argparse.ArgumentParser(description="Batch load contacts and patients from a CSV file into the registry.")
 parser.add_argument('input_file', type=str, help="Path to the CSV file containing contact and patient data.")
 parser.add_argument('db_file_location', type=str, help="Path to the SQLite DB file containing contact and patient data.")
+parser.add_argument('--outbox-db', type=str, help="Path to the SQLite DB file of the email outbox; a welcome email is queued for each new contact.")
+parser.add_argument('--region-index', type=str, help="Path to the region index file (region_index/region_index.py) used to check the region_id values.")
+parser.add_argument('--welcome-from', type=str, default=os.getenv('WELCOME_FROM_EMAIL'), help="Sender address of the welcome emails (default: $WELCOME_FROM_EMAIL).")
 args = parser.parse_args()
+if args.outbox_db and not args.welcome_from:
+    parser.error("--welcome-from (or WELCOME_FROM_EMAIL) is required with --outbox-db.")
 
 # 3. Read the data from the provided CSV file
 csv_file = args.input_file  # Take the CSV file path from the command-line argument
@@ -36,7 +43,20 @@ except pd.errors.ParserError:
 
 # 4. Initialize the PatientContactManager with the database path
 db_path = args.db_file_location
-manager = PatientContactManager(db_path)
+outbox = None
+if args.outbox_db:
+    # The outbox lives next to the SendGrid sender
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sendgrid"))
+    from outbox import EmailOutbox
+    outbox = EmailOutbox(args.outbox_db)
+    logger.info(f"Queueing welcome emails in the outbox: {args.outbox_db}")
+region_index = None
+if args.region_index:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "region_index"))
+    from region_index import RegionIndex
+    region_index = RegionIndex.load(args.region_index)
+    logger.info(f"Checking the region_id values with the region index: {args.region_index}")
+manager = PatientContactManager(db_path, outbox, args.welcome_from, region_index)
 
 # 5. Log the start of the batch loading process
 logger.info("Starting batch load of contacts and patients from the CSV file.")
@@ -1,15 +1,23 @@
 import sqlite3
 import logging
 import uuid
+from html import escape
 from patient import Patient
 from contact import Contact
 
+# Welcome email queued for each new contact when an outbox is given
+WELCOME_SUBJECT = "Welcome to the rettX registry"
+WELCOME_CONTENT = "<p>Dear {parent_name},</p><p>Thank you for joining the rettX patient registry.</p>"
+
 class PatientContactManager:
-    def __init__(self, db_path):
+    def __init__(self, db_path, outbox=None, welcome_from=None, region_index=None):
         """
         Initialize the manager class with the path to the SQLite database.
         Args:
             db_path (str): Path to the SQLite database file.
+            outbox (EmailOutbox): Optional outbox (sendgrid/outbox.py) to queue a welcome email for each new contact.
+            welcome_from (str): Sender address of the welcome emails.
+            region_index (RegionIndex): Optional index of the region codes (region_index/region_index.py) to check the region_id values.
         """
         self.conn = sqlite3.connect(db_path)
         self.cursor = self.conn.cursor()
@@ -18,6 +26,10 @@ class PatientContactManager:
         self.contact_manager = Contact(self.conn)
         self.patient_manager = Patient(self.conn)
 
+        self.outbox = outbox
+        self.welcome_from = welcome_from
+        self.region_index = region_index
+
         # Set up a logger for the manager
         self.logger = logging.getLogger(__name__)
 
@@ -31,6 +43,9 @@ class PatientContactManager:
         """
         self.logger.info(f"Processing contact: {contact_data['parent_name']} ({contact_data['email']}) and associated patient: {patient_data['rett_name']} {patient_data['rett_surname']}")
 
+        if self.region_index is not None:
+            self.check_region_id(contact_data)
+
         # Step 1: Add or update the contact
         contact_uuid = self.contact_manager.add_contact(contact_data)
         if not contact_uuid:
@@ -38,6 +53,8 @@ class PatientContactManager:
             contact_record = self.contact_manager.get_contact_by_email(contact_data['email'])
             contact_uuid = contact_record['contact_uuid']
             self.logger.info(f"Using existing contact UUID: {contact_uuid} for {contact_data['parent_name']}")
+        elif self.outbox:
+            self.queue_welcome_email(contact_data)
 
         # Step 2: Add or update the patient
         patient_uuid = self.patient_manager.add_patient(patient_data)
@@ -53,6 +70,42 @@ class PatientContactManager:
         else:
             self.logger.warning(f"No patient was linked for contact {contact_data['parent_name']} ({contact_data['email']})")
 
+    def check_region_id(self, contact_data):
+        """
+        Warn about a region_id that is not a known NUTS or ISO region code. The record is still loaded.
+        Args:
+            contact_data (dict): Contact details.
+        Returns:
+            bool: True if the region_id is known, False otherwise.
+        """
+        if self.region_index.is_valid_region_id(contact_data['region_id']):
+            return True
+        self.logger.warning(f"Unknown region_id {contact_data['region_id']} for contact {contact_data['parent_name']} ({contact_data['email']})")
+        return False
+
+    def queue_welcome_email(self, contact_data):
+        """
+        Queue the welcome email of a new contact in the outbox; a worker sends it later, so onboarding does not wait for SendGrid.
+        Args:
+            contact_data (dict): Contact details.
+        """
+        # The dedup key keeps a contact from getting the welcome email twice if the same input is loaded again
+        try:
+            entry_id = self.outbox.enqueue(
+                self.welcome_from,
+                contact_data['email'],
+                WELCOME_SUBJECT,
+                WELCOME_CONTENT.format(parent_name=escape(str(contact_data['parent_name']))),
+                dedup_key=f"welcome:{contact_data['email'].strip().lower()}"
+            )
+        except ValueError as e:
+            self.logger.warning(f"Welcome email not queued for {contact_data['email']}: {e}")
+            return
+        if entry_id:
+            self.logger.info(f"Welcome email queued for {contact_data['email']} (outbox id: {entry_id})")
+        else:
+            self.logger.info(f"Welcome email already queued for {contact_data['email']}. Skipping.")
+
     def link_contact_to_patient(self, contact_uuid, persona_rett_uuid, relationship_type):
         """
         Link an existing contact and patient using the relationship type.
@@ -0,0 +1,91 @@
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import redirect_stdout
+from convert import convert_nuts, convert_iso, run, DEFAULT_NUTS_CSV, DEFAULT_ISO_JSON, NUTS_LEVELS
+
+
+# The converters as they were before convert.py: whole input in memory, then json.dump
+def legacy_nuts(csv_file, output_prefix):
+    levels = {level: defaultdict(list) for level in NUTS_LEVELS}
+    with open(csv_file, encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            country_code = row["Country code"].strip()
+            if country_code and row["NUTS level"].strip() in levels:
+                levels[row["NUTS level"].strip()][country_code].append({"code": row["NUTS Code"].strip(), "label": row["NUTS label"].strip()})
+    for level, countries in levels.items():
+        output = {"data": [{"country_code": country_code, "regions": regions} for country_code, regions in countries.items()]}
+        with open(f"{output_prefix}_level{level}.json", "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=4)
+
+
+def legacy_iso(input_file, output_file):
+    with open(input_file, encoding="utf-8") as f:
+        flat_data = json.load(f)
+    countries = {}
+    for entry in flat_data:
+        countries.setdefault(entry["country"], []).append({"code": entry["code"], "label": entry["name"]})
+    output = {"version": 2, "data": [{"country_code": country_code, "regions": regions} for country_code, regions in countries.items()]}
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=4)
+
+
+def measure(action, repeat):
+    """Returns the best time of the runs, in ms, and the peak of traced memory of one run, in KB"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    action()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times) * 1000, peak / 1024
+
+
+def output_size(paths):
+    return sum(os.path.getsize(path) for path in paths) / 1024
+
+
+# Compares the converters on the full NUTS and ISO datasets, e.g. python benchmark.py --repeat 20
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the region converters on the full NUTS and ISO datasets.")
+    parser.add_argument('--nuts', type=str, default=DEFAULT_NUTS_CSV, help="NUTS CSV file.")
+    parser.add_argument('--iso', type=str, default=DEFAULT_ISO_JSON, help="ISO subdivisions JSON file.")
+    parser.add_argument('--repeat', type=int, default=10, help="Runs of each converter; the best time is kept.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    nuts_prefix = os.path.join(work_dir, "nuts")
+    nuts_outputs = [f"{nuts_prefix}_level{level}.json" for level in NUTS_LEVELS]
+    iso_output = os.path.join(work_dir, "iso.json")
+    cases = [
+        ("nuts", "legacy (json.dump)", lambda: legacy_nuts(args.nuts, nuts_prefix), nuts_outputs),
+        ("nuts", "streaming, pretty", lambda: convert_nuts(args.nuts, nuts_prefix), nuts_outputs),
+        ("nuts", "streaming, compact", lambda: convert_nuts(args.nuts, nuts_prefix, pretty=False), nuts_outputs),
+        ("nuts", "unchanged source", lambda: run("nuts", args.nuts, nuts_outputs, {"pretty": False},
+                                                 lambda: convert_nuts(args.nuts, nuts_prefix, pretty=False)), nuts_outputs),
+        ("iso", "legacy (json.load/dump)", lambda: legacy_iso(args.iso, iso_output), [iso_output]),
+        ("iso", "streaming, pretty", lambda: convert_iso(args.iso, iso_output), [iso_output]),
+        ("iso", "streaming, compact", lambda: convert_iso(args.iso, iso_output, pretty=False), [iso_output]),
+        ("iso", "unchanged source", lambda: run("iso", args.iso, [iso_output], {"pretty": False, "version": 2},
+                                                lambda: convert_iso(args.iso, iso_output, pretty=False)), [iso_output]),
+    ]
+
+    print(f"{'dataset':<8}{'converter':<26}{'time (ms)':>10}{'peak (KB)':>11}{'output (KB)':>13}")
+    try:
+        for dataset, name, action, outputs in cases:
+            # The messages of run() would flood the table
+            with redirect_stdout(io.StringIO()):
+                elapsed, peak = measure(action, args.repeat)
+            print(f"{dataset:<8}{name:<26}{elapsed:>10.1f}{peak:>11.0f}{output_size(outputs):>13.0f}")
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,250 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+EXPERIMENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_NUTS_CSV = os.path.join(EXPERIMENTS_DIR, "NUTS_converter", "nuts.csv")
+DEFAULT_NUTS_PREFIX = os.path.join(EXPERIMENTS_DIR, "NUTS_converter", "nuts_master_europe")
+DEFAULT_ISO_JSON = os.path.join(EXPERIMENTS_DIR, "ISO_converter", "subdivisions.json")
+DEFAULT_ISO_OUTPUT = os.path.join(EXPERIMENTS_DIR, "ISO_converter", "output.json")
+
+# Bump when the output of the converters changes, so the outputs are generated again
+CONVERTER_VERSION = 1
+MANIFEST_NAME = ".convert_manifest.json"
+NUTS_LEVELS = ("1", "2", "3")
+CHUNK_SIZE = 64 * 1024
+
+
+class GroupedRegionsWriter:
+    def __init__(self, f, metadata=None, pretty=True, ensure_ascii=False):
+        """
+        Write {<metadata>, "data": [{"country_code", "regions": [...]}]} one region at a time.
+        The pretty output is byte for byte what json.dump(..., indent=4) writes, the compact one has no whitespace.
+        Regions must come grouped by country, as a group is closed as soon as the next country starts.
+        Args:
+            f (file): Text file to write to.
+            metadata (dict): Fields written before "data".
+            pretty (bool): Indented output, or compact output.
+            ensure_ascii (bool): Escape the non-ASCII characters, like json.dump does by default.
+        """
+        self.f = f
+        self.pretty = pretty
+        # A reused encoder without indent keeps to the C implementation; the indentation is written here
+        self.encode = json.JSONEncoder(ensure_ascii=ensure_ascii).encode
+        self.colon = ": " if pretty else ":"
+        self.country_code = None
+        self.countries = set()
+        self.regions = 0
+        f.write("{")
+        for key, value in (metadata or {}).items():
+            f.write(f"{self.newline(1)}{self.encode(key)}{self.colon}{self.encode(value)},")
+        f.write(f"{self.newline(1)}{self.encode('data')}{self.colon}[")
+
+    def newline(self, depth):
+        return "\n" + " " * (4 * depth) if self.pretty else ""
+
+    def dumps(self, region, depth):
+        """Encodes a flat dict (its values are strings or numbers) as json.dumps does at that depth"""
+        items = ",".join(f"{self.newline(depth + 1)}{self.encode(key)}{self.colon}{self.encode(value)}" for key, value in region.items())
+        return f"{{{items}{self.newline(depth)}}}"
+
+    def add(self, country_code, region):
+        if country_code != self.country_code:
+            if country_code in self.countries:
+                raise ValueError(f"The regions of {country_code} are not contiguous in the input")
+            if self.country_code is not None:
+                self.f.write(f"{self.newline(3)}]{self.newline(2)}}},")
+            self.f.write(f"{self.newline(2)}{{{self.newline(3)}{self.encode('country_code')}{self.colon}{self.encode(country_code)},"
+                         f"{self.newline(3)}{self.encode('regions')}{self.colon}[")
+            self.country_code = country_code
+            self.countries.add(country_code)
+        elif self.regions:
+            self.f.write(",")
+        self.f.write(f"{self.newline(4)}{self.dumps(region, 4)}")
+        self.regions += 1
+
+    def close(self):
+        if self.country_code is not None:
+            self.f.write(f"{self.newline(3)}]{self.newline(2)}}}{self.newline(1)}]")
+        else:
+            self.f.write("]")
+        self.f.write(f"{self.newline(0)}}}")
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """
+    Yields the objects of a JSON array one at a time, reading the file in chunks instead of loading it whole.
+    Args:
+        f (file): Text file holding an array of objects, e.g. [{...}, {...}].
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("The input is not a JSON array")
+    position = 1
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            if position == len(buffer):
+                raise json.JSONDecodeError("Need more data", buffer, position)
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Unterminated JSON array")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def up_to_date(manifest_path, key, source_hash, options, outputs):
+    """Whether the outputs were generated from the same source, with the same options, and are still there"""
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, encoding="utf-8") as f:
+        entry = json.load(f).get(key)
+    return (entry is not None and entry["source_sha256"] == source_hash and entry["options"] == options
+            and entry["converter_version"] == CONVERTER_VERSION and all(os.path.exists(path) for path in outputs))
+
+
+def record_manifest(manifest_path, key, source_hash, options):
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    manifest[key] = {"source_sha256": source_hash, "options": options, "converter_version": CONVERTER_VERSION}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+
+
+def convert_nuts(csv_file, output_prefix, pretty=True):
+    """
+    Split the NUTS CSV into one JSON file per level, in a single pass over the CSV.
+    Args:
+        csv_file (str): NUTS CSV (;-separated, with Country code, NUTS Code, NUTS label and NUTS level columns).
+        output_prefix (str): Prefix of the output files, written to <prefix>_level{1,2,3}.json.
+        pretty (bool): Indented output (as json.dump with indent=4), or compact output.
+    Returns:
+        dict: Number of regions written per level.
+    """
+    outputs = {level: f"{output_prefix}_level{level}.json" for level in NUTS_LEVELS}
+    files = {level: open(f"{path}.tmp", "w", encoding="utf-8") for level, path in outputs.items()}
+    try:
+        writers = {level: GroupedRegionsWriter(f, pretty=pretty) for level, f in files.items()}
+        with open(csv_file, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                country_code = row["Country code"].strip()
+                nuts_level = row["NUTS level"].strip()
+                if not country_code or nuts_level not in writers:
+                    continue  # Skip rows without a country code or with an unexpected NUTS level
+                writers[nuts_level].add(country_code, {"code": row["NUTS Code"].strip(), "label": row["NUTS label"].strip()})
+        for writer in writers.values():
+            writer.close()
+    except Exception:
+        for level, f in files.items():
+            f.close()
+            os.remove(f"{outputs[level]}.tmp")
+        raise
+    finally:
+        for f in files.values():
+            f.close()
+    # Replace the outputs only once they are all complete
+    for level, path in outputs.items():
+        os.replace(f"{path}.tmp", path)
+    return {level: writer.regions for level, writer in writers.items()}
+
+
+def convert_iso(input_file, output_file, pretty=True, version=2):
+    """
+    Group the flat list of ISO subdivisions by country, streaming the input array.
+    Args:
+        input_file (str): JSON array of {"country", "code", "name"} objects, grouped by country.
+        output_file (str): Output file, with the registry metadata and {"country_code", "regions"} groups.
+        pretty (bool): Indented output (as json.dump with indent=4), or compact output.
+        version (int): Version written in the metadata.
+    Returns:
+        int: Number of regions written.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+    metadata = {
+        "created_at": now,
+        "created_by": "admin",
+        "version": version,
+        "last_updated_at": now,
+        "last_updated_by": "admin",
+        "is_latest": True,
+        "region_level": 2,
+        "is_deleted": False,
+        "type": "region",
+    }
+    try:
+        with open(input_file, encoding="utf-8") as f, open(f"{output_file}.tmp", "w", encoding="utf-8") as out:
+            # The ISO output has always escaped non-ASCII characters
+            writer = GroupedRegionsWriter(out, metadata, pretty=pretty, ensure_ascii=True)
+            for entry in iter_json_array(f):
+                writer.add(entry["country"], {"code": entry["code"], "label": entry["name"]})
+            writer.close()
+    except Exception:
+        if os.path.exists(f"{output_file}.tmp"):
+            os.remove(f"{output_file}.tmp")
+        raise
+    os.replace(f"{output_file}.tmp", output_file)
+    return writer.regions
+
+
+def run(command, source, outputs, options, convert, force=False):
+    """Run a conversion unless its outputs are up to date with the source. Returns the result, or None if skipped"""
+    manifest_path = os.path.join(os.path.dirname(os.path.abspath(outputs[0])), MANIFEST_NAME)
+    key = f"{command}:{os.path.basename(outputs[0])}"
+    source_hash = file_sha256(source)
+    if not force and up_to_date(manifest_path, key, source_hash, options, outputs):
+        print(f"{source} is unchanged, skipping ({', '.join(outputs)} up to date). Use --force to convert anyway.")
+        return None
+    start = time.perf_counter()
+    result = convert()
+    record_manifest(manifest_path, key, source_hash, options)
+    print(f"Converted {source} in {time.perf_counter() - start:.2f} s: {result}. Written to {', '.join(outputs)}")
+    return result
+
+
+# Converts the NUTS and ISO sources to the registry JSON files, e.g. python convert.py nuts --compact
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the NUTS and ISO region sources to the registry JSON files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    nuts_parser = subparsers.add_parser("nuts", help="Split the NUTS CSV into one JSON file per level.")
+    nuts_parser.add_argument('--input', type=str, default=DEFAULT_NUTS_CSV, help="NUTS CSV file.")
+    nuts_parser.add_argument('--output-prefix', type=str, default=DEFAULT_NUTS_PREFIX, help="Prefix of the output files.")
+    iso_parser = subparsers.add_parser("iso", help="Group the ISO subdivisions by country.")
+    iso_parser.add_argument('--input', type=str, default=DEFAULT_ISO_JSON, help="ISO subdivisions JSON file.")
+    iso_parser.add_argument('--output', type=str, default=DEFAULT_ISO_OUTPUT, help="Output file.")
+    iso_parser.add_argument('--version', type=int, default=2, help="Version written in the metadata.")
+    for subparser in (nuts_parser, iso_parser):
+        subparser.add_argument('--compact', action='store_true', help="Write compact JSON instead of indented JSON.")
+        subparser.add_argument('--force', action='store_true', help="Convert even if the source is unchanged.")
+    args = parser.parse_args()
+
+    pretty = not args.compact
+    if args.command == "nuts":
+        run("nuts", args.input, [f"{args.output_prefix}_level{level}.json" for level in NUTS_LEVELS], {"pretty": pretty},
+            lambda: convert_nuts(args.input, args.output_prefix, pretty), args.force)
+    else:
+        run("iso", args.input, [args.output], {"pretty": pretty, "version": args.version},
+            lambda: convert_iso(args.input, args.output, pretty, args.version), args.force)
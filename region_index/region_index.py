@@ -0,0 +1,341 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+
+EXPERIMENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_NUTS_FILES = [os.path.join(EXPERIMENTS_DIR, "NUTS_converter", f"nuts_master_europe_level{level}.json") for level in (1, 2, 3)]
+DEFAULT_ISO_FILE = os.path.join(EXPERIMENTS_DIR, "ISO_converter", "output.json")
+DEFAULT_INDEX_FILE = "regions.idx"
+
+# Binary format, little-endian:
+#   header   magic, version, record count, hash table slots, children count, offsets of the 4 sections
+#   records  one fixed-size record per region, sorted by code
+#   table    open-addressing hash table of code -> record number + 1 (0 is an empty slot), FNV-1a, linear probing
+#   children record numbers; the children of a region are a contiguous run, sorted by code
+#   strings  UTF-8 codes and labels
+MAGIC = b"RIDX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIIIIIIII")
+# code offset/length, label offset/length, parent, country root, first child, number of children, level, scheme
+RECORD = struct.Struct("<IHIHiiIIBB")
+SLOT = struct.Struct("<I")
+NO_PARENT = -1
+
+SCHEMES = ("country", "nuts", "iso")
+
+# NUTS and ISO disagree on the codes of some countries, a country filter covers both
+COUNTRY_ALIASES = {"GR": "EL", "EL": "GR", "GB": "UK", "UK": "GB"}
+
+
+def fnv1a(data: bytes):
+    """32-bit FNV-1a hash"""
+    h = 0x811c9dc5
+    for byte in data:
+        h = ((h ^ byte) * 0x01000193) & 0xffffffff
+    return h
+
+
+def read_regions(path: str, scheme: str):
+    """Yields (code, label, country_code, scheme) from a converter output ({"data": [{"country_code", "regions"}]})"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)["data"]
+    for country in data:
+        for region in country["regions"]:
+            yield region["code"].strip(), region["label"].strip(), country["country_code"].strip(), scheme
+
+
+def nuts_parent(code: str, codes):
+    """BE100 -> BE10 -> BE1 -> BE, skipping the levels missing from the data"""
+    parent = code[:-1]
+    while len(parent) > 2 and parent not in codes:
+        parent = parent[:-1]
+    return parent
+
+
+def build_index(nuts_files=DEFAULT_NUTS_FILES, iso_file=DEFAULT_ISO_FILE):
+    """
+    Build the binary index of the NUTS regions and the ISO subdivisions.
+    Each country gets a root region (e.g. BE), parent of its NUTS level 1 regions and of its ISO subdivisions.
+    The sources have no country names, so a root is labelled with its code. Countries whose NUTS and ISO codes
+    differ (EL/GR, UK/GB) get two roots, one per scheme; the country filters of RegionIndex accept either code.
+    Args:
+        nuts_files (list): NUTS converter outputs, one per level.
+        iso_file (str): ISO converter output, or None.
+    Returns:
+        bytes: The index, to save or to open with RegionIndex.
+    """
+    regions = {}
+    sources = [(path, "nuts") for path in nuts_files] + ([(iso_file, "iso")] if iso_file else [])
+    for path, scheme in sources:
+        for code, label, country, scheme in read_regions(path, scheme):
+            regions.setdefault(country, (country, "country", country))
+            if code in regions:
+                print(f"Duplicated code {code} in {path}, keeping the first one")
+                continue
+            regions[code] = (label, scheme, country)
+
+    codes = sorted(regions)
+    numbers = {code: number for number, code in enumerate(codes)}
+    parents = {}
+    children = {code: [] for code in codes}
+    for code in codes:
+        label, scheme, country = regions[code]
+        if scheme == "country":
+            continue
+        parent = nuts_parent(code, regions) if scheme == "nuts" else country
+        parents[code] = parent if parent in regions else country
+        children[parents[code]].append(code)
+
+    def level(code):
+        return 0 if code not in parents else level(parents[code]) + 1
+
+    strings = bytearray()
+    child_numbers = []
+    records = bytearray()
+    for code in codes:
+        label, scheme, country = regions[code]
+        code_bytes, label_bytes = code.encode("utf-8"), label.encode("utf-8")
+        code_offset = len(strings)
+        strings += code_bytes
+        label_offset = len(strings)
+        strings += label_bytes
+        first_child = len(child_numbers)
+        child_numbers.extend(numbers[child] for child in children[code])
+        records += RECORD.pack(code_offset, len(code_bytes), label_offset, len(label_bytes),
+                               numbers[parents[code]] if code in parents else NO_PARENT,
+                               numbers[country], first_child, len(children[code]), level(code), SCHEMES.index(scheme))
+
+    # At most half full, so probes stay short
+    slots = 1
+    while slots < 2 * len(codes):
+        slots *= 2
+    table = [0] * slots
+    for number, code in enumerate(codes):
+        slot = fnv1a(code.encode("utf-8")) & (slots - 1)
+        while table[slot]:
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = number + 1
+
+    records_offset = HEADER.size
+    table_offset = records_offset + len(records)
+    children_offset = table_offset + slots * SLOT.size
+    strings_offset = children_offset + len(child_numbers) * SLOT.size
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(codes), slots, len(child_numbers),
+                         records_offset, table_offset, children_offset, strings_offset)
+    return b"".join([header, bytes(records), struct.pack(f"<{slots}I", *table),
+                     struct.pack(f"<{len(child_numbers)}I", *child_numbers), bytes(strings)])
+
+
+class RegionIndex:
+    def __init__(self, buffer):
+        """
+        Region index over a buffer built by build_index, either in memory or memory-mapped from a file (see load).
+        Nothing is parsed up front: lookups read the records they need straight from the buffer.
+        Args:
+            buffer (bytes or mmap): The index.
+        """
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        magic, version, self.count, self.slots, self.children_count, self.records_offset, self.table_offset, \
+            self.children_offset, self.strings_offset = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a region index file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported region index version {version}, expected {FORMAT_VERSION}: build it again")
+        self.mmap = None
+
+    @classmethod
+    def load(cls, path: str):
+        """Memory-map an index file, so opening it costs the same whatever its size"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = cls(mapped)
+        index.mmap = mapped
+        return index
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.view)
+
+    def close(self):
+        self.view.release()
+        if self.mmap is not None:
+            self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, code):
+        return self.find(code) is not None
+
+    # Low-level access by record number
+
+    def record(self, number: int):
+        return RECORD.unpack_from(self.buffer, self.records_offset + number * RECORD.size)
+
+    def string(self, offset: int, length: int):
+        start = self.strings_offset + offset
+        return str(self.view[start:start + length], "utf-8")
+
+    def find(self, code: str):
+        """Returns the record number of a code, or None"""
+        if not isinstance(code, str):
+            return None
+        key = code.strip().upper().encode("utf-8")
+        mask = self.slots - 1
+        slot = fnv1a(key) & mask
+        while True:
+            entry = SLOT.unpack_from(self.buffer, self.table_offset + slot * SLOT.size)[0]
+            if not entry:
+                return None
+            code_offset, code_length = RECORD.unpack_from(self.buffer, self.records_offset + (entry - 1) * RECORD.size)[:2]
+            start = self.strings_offset + code_offset
+            if code_length == len(key) and self.view[start:start + code_length] == key:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def region(self, number: int):
+        code_offset, code_length, label_offset, label_length, parent, country, _, _, level, scheme = self.record(number)
+        return {
+            "code": self.string(code_offset, code_length),
+            "label": self.string(label_offset, label_length),
+            "country_code": self.code(country),
+            "level": level,
+            "scheme": SCHEMES[scheme],
+            "parent": self.code(parent) if parent != NO_PARENT else None,
+        }
+
+    def code(self, number: int):
+        code_offset, code_length = self.record(number)[:2]
+        return self.string(code_offset, code_length)
+
+    def child_numbers(self, number: int):
+        first, count = self.record(number)[6:8]
+        start = self.children_offset + first * SLOT.size
+        return struct.unpack_from(f"<{count}I", self.buffer, start)
+
+    # Lookups by code
+
+    def get(self, code: str):
+        """
+        Returns the region of a code (code, label, country_code, level, scheme, parent), or None if unknown.
+        level is the depth below the country root: the NUTS level for NUTS regions, 1 for ISO subdivisions.
+        """
+        number = self.find(code)
+        return self.region(number) if number is not None else None
+
+    def label(self, code: str):
+        number = self.find(code)
+        if number is None:
+            return None
+        label_offset, label_length = self.record(number)[2:4]
+        return self.string(label_offset, label_length)
+
+    def parent(self, code: str):
+        """Returns the code of the parent region (BE10 -> BE1 -> BE), or None for a country or an unknown code"""
+        number = self.find(code)
+        if number is None:
+            return None
+        parent = self.record(number)[4]
+        return self.code(parent) if parent != NO_PARENT else None
+
+    def children(self, code: str):
+        """Returns the codes of the regions directly below a code, sorted"""
+        number = self.find(code)
+        return [self.code(child) for child in self.child_numbers(number)] if number is not None else []
+
+    def ancestors(self, code: str):
+        """Returns the codes from the parent up to the country root, e.g. BE100 -> [BE10, BE1, BE]"""
+        number = self.find(code)
+        codes = []
+        while number is not None:
+            number = self.record(number)[4]
+            if number == NO_PARENT:
+                break
+            codes.append(self.code(number))
+        return codes
+
+    def regions_in_country(self, country_code: str, level: int = None, scheme: str = None):
+        """
+        Returns the regions of a country, in hierarchical order (each region before its children).
+        Args:
+            country_code (str): Country code, e.g. BE; the NUTS and ISO codes of Greece (EL/GR) and of the
+                United Kingdom (UK/GB) both return the regions of the two schemes.
+            level (int): Only the regions at this depth (1 to 3 for NUTS).
+            scheme (str): Only the "nuts" regions or the "iso" subdivisions.
+        Returns:
+            list: Region dicts, as returned by get.
+        """
+        if not isinstance(country_code, str):
+            return []
+        country_code = country_code.strip().upper()
+        roots = [root for root in (self.find(country_code), self.find(COUNTRY_ALIASES.get(country_code))) if root is not None]
+        regions = []
+        stack = [child for root in reversed(roots) for child in reversed(self.child_numbers(root))]
+        while stack:
+            number = stack.pop()
+            record = self.record(number)
+            if (level is None or record[8] == level) and (scheme is None or SCHEMES[record[9]] == scheme):
+                regions.append(self.region(number))
+            if level is None or record[8] < level:
+                stack.extend(reversed(self.child_numbers(number)))
+        return regions
+
+    def is_valid_region_id(self, region_id, country_code: str = None):
+        """Whether a region_id is a known region code, of the given country (NUTS or ISO code) if any"""
+        if region_id is None:
+            return False
+        number = self.find(str(region_id))
+        if number is None:
+            return False
+        if country_code is None:
+            return True
+        country_code = country_code.strip().upper()
+        return self.code(self.record(number)[5]) in (country_code, COUNTRY_ALIASES.get(country_code))
+
+
+# Builds the index from the converter outputs, then looks up codes, e.g. python region_index.py lookup BE100 ES-M
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the binary index of the NUTS and ISO region codes.")
+    parser.add_argument('--index', type=str, default=DEFAULT_INDEX_FILE, help="Path to the index file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Build the index from the NUTS and ISO converter outputs.")
+    build_parser.add_argument('--nuts', nargs='+', default=DEFAULT_NUTS_FILES, help="NUTS level files.")
+    build_parser.add_argument('--iso', type=str, default=DEFAULT_ISO_FILE, help="ISO subdivisions file.")
+    lookup_parser = subparsers.add_parser("lookup", help="Print the regions of some codes, with their ancestors and children.")
+    lookup_parser.add_argument('codes', nargs='+', help="Region codes.")
+    country_parser = subparsers.add_parser("country", help="List the regions of a country.")
+    country_parser.add_argument('country_code', type=str, help="Country code, e.g. BE.")
+    country_parser.add_argument('--level', type=int, help="Only the regions at this level.")
+    country_parser.add_argument('--scheme', choices=["nuts", "iso"], help="Only the NUTS regions or the ISO subdivisions.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = RegionIndex(build_index(args.nuts, args.iso))
+        index.save(args.index)
+        print(f"{len(index)} regions indexed in {time.perf_counter() - start:.2f} s, "
+              f"{os.path.getsize(args.index)} bytes written to {args.index}")
+    else:
+        with RegionIndex.load(args.index) as index:
+            if args.command == "lookup":
+                for code in args.codes:
+                    region = index.get(code)
+                    if region is None:
+                        print(f"{code}: unknown")
+                        continue
+                    print(f"{region['code']}: {region['label']} ({region['scheme']} level {region['level']})")
+                    print(f"    ancestors: {' > '.join(index.ancestors(code)) or '-'}")
+                    print(f"    children: {', '.join(index.children(code)) or '-'}")
+            else:
+                for region in index.regions_in_country(args.country_code, args.level, args.scheme):
+                    print(f"{'    ' * (region['level'] - 1)}{region['code']}: {region['label']}")
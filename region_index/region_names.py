@@ -0,0 +1,166 @@
+import argparse
+import csv
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+from region_index import read_regions, COUNTRY_ALIASES, DEFAULT_NUTS_FILES, DEFAULT_ISO_FILE
+
+DEFAULT_LIMIT = 5
+DEFAULT_MIN_SCORE = 0.3
+NON_ALPHANUMERIC = re.compile(r"[\W_]+")
+
+
+def normalize(text: str):
+    """Fold accents and case, and keep only letters and digits: "Région de Bruxelles-Capitale" -> "region de bruxelles capitale" """
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return NON_ALPHANUMERIC.sub(" ", folded).strip()
+
+
+def trigrams(normalized: str):
+    """Trigrams of each word, padded like pg_trgm ("  lyon " -> "  l", " ly", "lyo", "yon", "on "), so short words still match"""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class RegionNameIndex:
+    def __init__(self, regions):
+        """
+        Trigram index of region names, built once and queried many times.
+        Each alias of a label ("Région de Bruxelles-Capitale/Brussels Hoofdstedelijk Gewest") is indexed on its own.
+        Args:
+            regions (iterable): (code, label, country_code, scheme) tuples, as read_regions yields them.
+        """
+        self.names = []  # (code, country_code, label, alias, number of trigrams)
+        self.labels = {}
+        self.postings = defaultdict(list)  # trigram -> name ids
+        self.country_postings = defaultdict(lambda: defaultdict(list))  # country -> trigram -> name ids
+        for code, label, country_code, scheme in regions:
+            self.labels[code] = label
+            for alias in label.split("/"):
+                grams = trigrams(normalize(alias))
+                if not grams:
+                    continue
+                name_id = len(self.names)
+                self.names.append((code, country_code, label, alias.strip(), len(grams)))
+                for gram in grams:
+                    self.postings[gram].append(name_id)
+                    self.country_postings[country_code][gram].append(name_id)
+
+    @classmethod
+    def from_files(cls, nuts_files=DEFAULT_NUTS_FILES, iso_file=DEFAULT_ISO_FILE):
+        """Index the labels of the NUTS converter outputs and the names of the ISO subdivisions"""
+        sources = [(path, "nuts") for path in nuts_files] + ([(iso_file, "iso")] if iso_file else [])
+        return cls(region for path, scheme in sources for region in read_regions(path, scheme))
+
+    def has_country(self, country_code: str):
+        return country_code in self.country_postings or COUNTRY_ALIASES.get(country_code) in self.country_postings
+
+    def search(self, text: str, country_code: str = None, limit: int = DEFAULT_LIMIT, min_score: float = DEFAULT_MIN_SCORE):
+        """
+        Rank the region codes whose name looks like a free-text region name.
+        Only the names sharing a trigram with the text are scored, through the postings, instead of every label.
+        Args:
+            text (str): Free-text region name, e.g. "Bruxelles".
+            country_code (str): Only the regions of this country (NUTS or ISO code), if given.
+            limit (int): Maximum number of candidates.
+            min_score (float): Minimum similarity, from 0 to 1.
+        Returns:
+            list: Candidate dicts (code, label, alias, country_code, score), best first, one per code.
+        """
+        grams = trigrams(normalize(text or ""))
+        if not grams:
+            return []
+        if country_code:
+            country_code = country_code.strip().upper()
+            postings = [self.country_postings[code] for code in (country_code, COUNTRY_ALIASES.get(country_code))
+                        if code in self.country_postings]
+        else:
+            postings = [self.postings]
+
+        shared = defaultdict(int)
+        for gram in grams:
+            for country_postings in postings:
+                for name_id in country_postings.get(gram, ()):
+                    shared[name_id] += 1
+
+        best = {}
+        for name_id, count in shared.items():
+            code, name_country, label, alias, name_grams = self.names[name_id]
+            # Dice coefficient of the two trigram sets
+            score = 2 * count / (len(grams) + name_grams)
+            if score >= min_score and (code not in best or score > best[code]["score"]):
+                best[code] = {"code": code, "label": label, "alias": alias, "country_code": name_country, "score": round(score, 3)}
+        return sorted(best.values(), key=lambda candidate: (-candidate["score"], candidate["code"]))[:limit]
+
+    def match_csv(self, input_file, output_file, column: str, country_column: str = None, sep: str = ";",
+                  min_score: float = DEFAULT_MIN_SCORE):
+        """
+        Resolve a whole CSV column, adding the best code, its label and its score to each row.
+        The country column can hold codes (BE); other values (Spain) search every country.
+        Repeated values are only searched once.
+        Returns:
+            dict: Number of rows, matched rows and distinct searches.
+        """
+        cache = {}
+        counts = {"rows": 0, "matched": 0, "searches": 0}
+        with open(input_file, encoding="utf-8", newline="") as f, open(output_file, "w", encoding="utf-8", newline="") as out:
+            reader = csv.DictReader(f, delimiter=sep)
+            if column not in reader.fieldnames or (country_column and country_column not in reader.fieldnames):
+                raise ValueError(f"Column not found in {input_file}: {column if column not in reader.fieldnames else country_column}")
+            writer = csv.DictWriter(out, fieldnames=reader.fieldnames + ["matched_region_id", "matched_label", "match_score"], delimiter=sep)
+            writer.writeheader()
+            for row in reader:
+                country = (row.get(country_column) or "").strip().upper() if country_column else None
+                if country and not self.has_country(country):
+                    country = None
+                key = (row[column], country)
+                if key not in cache:
+                    cache[key] = self.search(row[column], country, limit=1, min_score=min_score)
+                    counts["searches"] += 1
+                candidates = cache[key]
+                best = candidates[0] if candidates else {}
+                writer.writerow({**row, "matched_region_id": best.get("code", ""), "matched_label": best.get("label", ""),
+                                 "match_score": best.get("score", "")})
+                counts["rows"] += 1
+                counts["matched"] += bool(best)
+        return counts
+
+
+# Resolves free-text region names to codes, e.g. python region_names.py search "Bruxelles" --country BE
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve free-text region names to NUTS and ISO region codes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    search_parser = subparsers.add_parser("search", help="Print the best codes of some region names.")
+    search_parser.add_argument('names', nargs='+', help="Region names.")
+    search_parser.add_argument('--country', type=str, help="Only the regions of this country code.")
+    search_parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help="Candidates per name.")
+    match_parser = subparsers.add_parser("match", help="Resolve a column of a CSV file.")
+    match_parser.add_argument('input_file', type=str, help="CSV file with a column of region names.")
+    match_parser.add_argument('--column', type=str, required=True, help="Column of the region names.")
+    match_parser.add_argument('--country-column', type=str, help="Column of the country codes, to search only their regions.")
+    match_parser.add_argument('--sep', type=str, default=";", help="Separator of the CSV file.")
+    match_parser.add_argument('--output', type=str, default="matched.csv", help="CSV file to write, with the matched_region_id, matched_label and match_score columns.")
+    for subparser in (search_parser, match_parser):
+        subparser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE, help="Minimum similarity, from 0 to 1.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = RegionNameIndex.from_files()
+    print(f"{len(index.names)} names of {len(index.labels)} regions indexed in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+
+    if args.command == "search":
+        for name in args.names:
+            print(name)
+            for candidate in index.search(name, args.country, args.limit, args.min_score):
+                print(f"    {candidate['score']:.3f} {candidate['code']}: {candidate['label']}")
+    else:
+        start = time.perf_counter()
+        counts = index.match_csv(args.input_file, args.output, args.column, args.country_column, args.sep, args.min_score)
+        print(f"{counts['matched']} of {counts['rows']} rows matched ({counts['searches']} distinct names) in "
+              f"{time.perf_counter() - start:.2f} s. Written to {args.output}")
@@ -0,0 +1,190 @@
+# Campaign mailer: streams the registry contacts and sends them templated emails in batches
+import argparse
+import json
+import os
+import sqlite3
+import time
+from html import escape
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
+from send_email import EmailConfig, SendGridEmailSender, MAX_PERSONALIZATIONS
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_LOCALE = "en"
+
+# Locale of the emails of each country, as stored in the country column of Contacts
+COUNTRY_LOCALES = {
+    "Spain": "es", "Mexico": "es", "Argentina": "es", "Colombia": "es", "Chile": "es",
+    "France": "fr", "Belgium": "fr", "Italy": "it", "Portugal": "pt", "Brazil": "pt",
+    "Germany": "de", "Austria": "de", "Netherlands": "nl",
+    "United Kingdom": "en", "Ireland": "en", "United States": "en",
+}
+
+# Contact columns available to the templates, replaced per recipient by SendGrid substitutions
+CONTACT_FIELDS = ("parent_name", "email", "region_id", "contact_uuid")
+
+
+def iter_contacts(db_path: str, page_size: int = DEFAULT_PAGE_SIZE, country: str = None):
+    """
+    Stream the contacts of the registry, one page at a time.
+    Keyset pagination on the primary key keeps every page an index range scan, however deep into the table.
+    Args:
+        db_path (str): Path to the SQLite database of data-integration.
+        page_size (int): Contacts read per query.
+        country (str): Only the contacts of this country, if given.
+    Returns:
+        generator: Contact dicts with the CONTACT_FIELDS and country.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    query = f"SELECT {', '.join(CONTACT_FIELDS)}, country FROM Contacts WHERE contact_uuid > ?"
+    params = []
+    if country:
+        query += " AND country = ?"
+        params.append(country)
+    query += " ORDER BY contact_uuid LIMIT ?"
+    try:
+        last_uuid = ""
+        while True:
+            rows = conn.execute(query, [last_uuid, *params, page_size]).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < page_size:
+                return
+            last_uuid = rows[-1]["contact_uuid"]
+    finally:
+        conn.close()
+
+
+def country_slug(country: str):
+    return (country or "").strip().lower().replace(" ", "-")
+
+
+class CampaignTemplates:
+    def __init__(self, template_dir: str, default_locale: str = DEFAULT_LOCALE):
+        """
+        Templates of a campaign, one Jinja2 file per locale (es.html) with optional overrides per country
+        (es.spain.html, which can {% extends "es.html" %}). Each template sets its subject with
+        {% set subject = "..." %}.
+        Args:
+            template_dir (str): Directory of the templates.
+            default_locale (str): Locale of the countries without their own.
+        """
+        self.default_locale = default_locale
+        self.environment = Environment(loader=FileSystemLoader(template_dir), autoescape=select_autoescape(["html"]))
+        self.compiled = {}
+
+    def locale_for(self, country: str):
+        return COUNTRY_LOCALES.get((country or "").strip(), self.default_locale)
+
+    def get(self, country: str):
+        """
+        Returns the (subject, html) of a country, compiled and rendered only once per locale and country.
+        Contact fields are rendered as -field- placeholders, filled in per recipient by SendGrid.
+        """
+        locale = self.locale_for(country)
+        key = (locale, country)
+        if key not in self.compiled:
+            names = [f"{locale}.{country_slug(country)}.html", f"{locale}.html", f"{self.default_locale}.html"]
+            template = self.environment.select_template(names)
+            context = {field: f"-{field}-" for field in CONTACT_FIELDS}
+            context.update(locale=locale, country=country)
+            module = template.make_module(context)
+            subject = getattr(module, "subject", None)
+            if not subject:
+                raise ValueError(f"Template {template.name} does not set a subject")
+            self.compiled[key] = (str(subject), str(module))
+        return self.compiled[key]
+
+
+def substitutions_for(contact: dict):
+    """Returns the per-recipient substitutions of a contact, escaped as they end up in HTML"""
+    return {f"-{field}-": escape(str(contact.get(field) or "")) for field in CONTACT_FIELDS}
+
+
+class Campaign:
+    def __init__(self, templates: CampaignTemplates, from_email: str, send_bulk, batch_size: int = MAX_PERSONALIZATIONS,
+                 report_file=None):
+        """
+        Args:
+            templates (CampaignTemplates): Templates of the campaign.
+            from_email (str): Sender address.
+            send_bulk (callable): Batched sender with the signature of SendGridEmailSender.send_bulk_email
+                (or EmailDispatcher.dispatch_bulk), returning BatchResult objects.
+            batch_size (int): Recipients per API call.
+            report_file (file): Optional text file where each failed recipient is written as a JSON line.
+        """
+        self.templates = templates
+        self.from_email = from_email
+        self.send_bulk = send_bulk
+        self.batch_size = min(batch_size, MAX_PERSONALIZATIONS)
+        self.report_file = report_file
+        self.counts = {"contacts": 0, "accepted": 0, "failed": 0, "batches": 0}
+
+    def flush(self, country: str, recipients: list):
+        subject, content = self.templates.get(country)
+        for result in self.send_bulk(self.from_email, recipients, subject, content, self.batch_size):
+            if result.batch is not None:
+                self.counts["batches"] += 1
+            self.counts["accepted"] += len(result.accepted)
+            self.counts["failed"] += len(result.failed)
+            if self.report_file:
+                for failure in result.failed:
+                    self.report_file.write(json.dumps({"country": country, **failure}) + "\n")
+
+    def run(self, contacts):
+        """
+        Send the campaign to a stream of contacts. Recipients are buffered per country and sent as soon as
+        a buffer fills a batch, so memory depends on the number of countries, not on the number of contacts.
+        Returns:
+            dict: Number of contacts, accepted and failed recipients, and batches sent.
+        """
+        buffers = {}
+        for contact in contacts:
+            self.counts["contacts"] += 1
+            country = contact.get("country") or ""
+            buffer = buffers.setdefault(country, [])
+            buffer.append({"email": contact["email"], "substitutions": substitutions_for(contact)})
+            if len(buffer) >= self.batch_size:
+                self.flush(country, buffer)
+                buffers[country] = []
+        for country, buffer in buffers.items():
+            if buffer:
+                self.flush(country, buffer)
+        return self.counts
+
+
+# Sends a campaign to the registry, e.g. python campaign.py ../data-integration/database.db campaigns/welcome registry@rettx.eu
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a templated email campaign to the contacts of the registry.")
+    parser.add_argument('db_file_location', type=str, help="Path to the SQLite DB file containing the contacts.")
+    parser.add_argument('template_dir', type=str, help="Directory of the campaign templates (<locale>.html, <locale>.<country>.html).")
+    parser.add_argument('from_email', type=str, help="The email address of the sender.")
+    parser.add_argument('--country', type=str, help="Only send to the contacts of this country.")
+    parser.add_argument('--host', type=str, help="Base URL of the API, e.g. http://127.0.0.1:3030 for mock_sendgrid.py.")
+    parser.add_argument('--batch-size', type=int, default=MAX_PERSONALIZATIONS, help="Recipients per API call.")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help="Contacts read from the database per query.")
+    parser.add_argument('--default-locale', type=str, default=DEFAULT_LOCALE, help="Locale of the countries without their own.")
+    parser.add_argument('--dry-run', action='store_true', help="Render the templates and count the recipients without sending.")
+    parser.add_argument('--report', type=str, help="Write the failed recipients as JSON lines to this file.")
+    args = parser.parse_args()
+
+    templates = CampaignTemplates(args.template_dir, args.default_locale)
+    if args.dry_run:
+        def send_bulk(from_email, recipients, subject, content, batch_size):
+            print(f"{len(recipients)} recipients, subject: {subject}")
+            return []
+    else:
+        send_bulk = SendGridEmailSender(EmailConfig(os.getenv('SENDGRID_API_KEY'), args.host)).send_bulk_email
+
+    report_file = open(args.report, "w", encoding="utf-8") if args.report else None
+    start = time.perf_counter()
+    try:
+        campaign = Campaign(templates, args.from_email, send_bulk, args.batch_size, report_file)
+        counts = campaign.run(iter_contacts(args.db_file_location, args.page_size, args.country))
+    except TemplateNotFound as e:
+        parser.error(f"No template found in {args.template_dir}: {e}")
+    finally:
+        if report_file:
+            report_file.close()
+    print(f"{counts['contacts']} contacts in {time.perf_counter() - start:.2f} s: {counts['accepted']} accepted, "
+          f"{counts['failed']} failed in {counts['batches']} batches")
@@ -0,0 +1,175 @@
+# Concurrent, rate-limited email dispatch on top of SendGridEmailSender
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from urllib.error import URLError
+from python_http_client.exceptions import HTTPError
+from send_email import SendGridEmailSender, BatchResult, split_valid_recipients, make_batches, with_invalid_recipients, MAX_PERSONALIZATIONS
+
+# Status codes worth retrying: throttling and server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Token bucket limiting the rate of API calls across all the workers
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """rate is the number of calls per second, capacity the size of the allowed bursts (defaults to rate)"""
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call is allowed"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Result of one dispatched email
+class DispatchResult:
+    def __init__(self, key, status_code: int = None, attempts: int = 0, error: str = None, seconds: float = 0.0,
+                 retryable: bool = False):
+        self.key = key
+        self.status_code = status_code
+        self.attempts = attempts
+        self.error = error
+        self.seconds = seconds
+        # Whether a failed email could go through later (throttled, server or network error)
+        self.retryable = retryable
+
+    @property
+    def ok(self):
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+    def to_dict(self):
+        return {
+            "key": self.key,
+            "ok": self.ok,
+            "status_code": self.status_code,
+            "attempts": self.attempts,
+            "error": self.error,
+            "retryable": self.retryable,
+            "seconds": round(self.seconds, 3)
+        }
+
+# Sends emails with a pool of workers, a shared rate limit, and retries on 429 and 5xx responses
+class EmailDispatcher:
+    def __init__(self, sender: SendGridEmailSender, workers: int = 4, rate: float = 10.0, burst: float = None,
+                 max_retries: int = 5, backoff: float = 1.0, max_backoff: float = 60.0):
+        """
+        workers: number of API calls in flight at the same time.
+        rate, burst: API calls allowed per second, and the size of the allowed bursts.
+        max_retries: retries of a call after a 429, a 5xx or a network error.
+        backoff, max_backoff: first and maximum wait between retries, in seconds; the wait doubles on
+        each retry unless a 429 response says when to retry.
+        """
+        self.sender = sender
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def retry_delay(self, attempt: int, error: Exception = None):
+        """Returns the wait before the next attempt, following Retry-After or X-RateLimit-Reset on 429"""
+        headers = getattr(error, "headers", None)
+        if getattr(error, "status_code", None) == 429 and headers is not None:
+            retry_after = headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+            reset = headers.get("X-RateLimit-Reset")
+            if reset:
+                try:
+                    return min(max(float(reset) - time.time(), 0.0), self.max_backoff)
+                except ValueError:
+                    pass
+        delay = min(self.backoff * (2 ** (attempt - 1)), self.max_backoff)
+        # Jitter spreads the retries of the workers over time
+        return delay * random.uniform(0.5, 1.0)
+
+    def send_with_retry(self, key, message):
+        """Sends one email object, retrying throttling, server and network errors. Never raises"""
+        result = DispatchResult(key)
+        start = time.perf_counter()
+        while True:
+            result.attempts += 1
+            self.bucket.acquire()
+            try:
+                response = self.sender.deliver(message)
+                result.status_code = response.status_code
+                result.error = None
+                result.retryable = False
+                break
+            except HTTPError as e:
+                result.status_code = e.status_code
+                result.error = e.body.decode("utf-8", "replace") if isinstance(e.body, bytes) else str(e.body)
+                result.retryable = e.status_code in RETRYABLE_STATUS_CODES
+                error = e
+            except (URLError, OSError, HTTPException) as e:
+                result.status_code = None
+                result.error = str(e)
+                result.retryable = True
+                error = e
+            except Exception as e:
+                # Anything else is recorded too, so that dispatch() still returns a result for every job
+                result.status_code = None
+                result.error = f"{type(e).__name__}: {e}"
+                result.retryable = False
+                break
+            if not result.retryable or result.attempts > self.max_retries:
+                break
+            time.sleep(self.retry_delay(result.attempts, error))
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def dispatch(self, jobs):
+        """
+        Sends (key, message) pairs concurrently, where message is a sendgrid Mail and key identifies it.
+        Returns the DispatchResult of each job, in order.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.send_with_retry, key, message) for key, message in jobs]
+            return [future.result() for future in futures]
+
+    def dispatch_emails(self, emails: list):
+        """
+        Sends single emails, given as dicts with from_email, to_emails, subject, content and an optional key.
+        Returns the DispatchResult of each email, in order.
+        """
+        jobs = [
+            (email.get("key", index), self.sender.build_message(email["from_email"], email["to_emails"], email["subject"], email["content"]))
+            for index, email in enumerate(emails)
+        ]
+        return self.dispatch(jobs)
+
+    def dispatch_bulk(self, from_email: str, recipients: list, subject: str, content: str,
+                      batch_size: int = MAX_PERSONALIZATIONS):
+        """
+        Concurrent version of SendGridEmailSender.send_bulk_email: the batches of recipients are sent
+        by the workers. Returns one BatchResult per batch, in order, then one for the invalid recipients if any.
+        """
+        valid, invalid = split_valid_recipients(recipients)
+        batches = make_batches(valid, batch_size)
+        jobs = [(index, self.sender.build_bulk_message(from_email, batch, subject, content)) for index, batch in enumerate(batches)]
+        results = []
+        for batch, dispatched in zip(batches, self.dispatch(jobs)):
+            emails = [recipient["email"] for recipient in batch]
+            result = BatchResult(dispatched.key, dispatched.status_code, error=dispatched.error)
+            if dispatched.ok:
+                result.accepted = emails
+            else:
+                result.failed = [{"email": email, "error": dispatched.error} for email in emails]
+            results.append(result)
+        return with_invalid_recipients(results, invalid)
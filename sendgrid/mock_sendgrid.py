@@ -0,0 +1,158 @@
+# Local stand-in for the SendGrid v3 mail send endpoint, to try the senders without sending real emails
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_PERSONALIZATIONS = 1000
+
+
+class MockSendGrid:
+    def __init__(self, host: str = "127.0.0.1", port: int = 3030, verbose: bool = True,
+                 latency: float = 0.0, rate_limit: int = None, error_rate: float = 0.0):
+        """
+        latency: seconds spent on each request.
+        rate_limit: requests accepted per second; the others get a 429 with Retry-After, like the API.
+        error_rate: share of the requests answered with a 503.
+        """
+        self.verbose = verbose
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.messages = []
+        self.window_start = 0
+        self.window_requests = 0
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def recipients(self):
+        """Every recipient accepted so far, in order"""
+        with self.lock:
+            return [to["email"] for message in self.messages
+                    for personalization in message["personalizations"] for to in personalization.get("to", [])]
+
+    def check_message(self, message):
+        """Returns the list of errors of a mail send request, like the API does"""
+        errors = []
+        personalizations = message.get("personalizations") or []
+        if not personalizations:
+            errors.append({"field": "personalizations", "message": "The personalizations field is required."})
+        if len(personalizations) > MAX_PERSONALIZATIONS:
+            errors.append({"field": "personalizations", "message": f"The personalizations field cannot have more than {MAX_PERSONALIZATIONS} objects."})
+        if not message.get("from", {}).get("email"):
+            errors.append({"field": "from.email", "message": "The from email is required."})
+        return errors
+
+    def throttle(self):
+        """Returns the seconds to wait if the request is over the rate limit, or None"""
+        if not self.rate_limit:
+            return None
+        now = time.time()
+        with self.lock:
+            window = int(now)
+            if window != self.window_start:
+                self.window_start, self.window_requests = window, 0
+            self.window_requests += 1
+            if self.window_requests <= self.rate_limit:
+                return None
+            self.throttled += 1
+            return window + 1 - now
+
+    def respond(self, message):
+        """Returns the (status, body, headers) of the response to a valid message"""
+        with self.lock:
+            self.messages.append(message)
+        return 202, b"", {"X-Message-Id": uuid.uuid4().hex}
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                if body:
+                    self.send_header("Content-Type", "application/json")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with mock.lock:
+                    mock.requests += 1
+                if self.path != "/v3/mail/send":
+                    self.send(404, json.dumps({"errors": [{"message": "Not found"}]}).encode("utf-8"))
+                    return
+                try:
+                    message = json.loads(body)
+                except ValueError:
+                    self.send(400, json.dumps({"errors": [{"message": "Invalid JSON"}]}).encode("utf-8"))
+                    return
+                errors = mock.check_message(message)
+                if errors:
+                    self.send(400, json.dumps({"errors": errors}).encode("utf-8"))
+                    return
+                if mock.latency:
+                    time.sleep(mock.latency)
+                wait = mock.throttle()
+                if wait is not None:
+                    self.send(429, json.dumps({"errors": [{"message": "Too many requests"}]}).encode("utf-8"),
+                              {"Retry-After": f"{wait:.3f}", "X-RateLimit-Limit": str(mock.rate_limit),
+                               "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(mock.window_start + 1)})
+                    return
+                if mock.error_rate and random.random() < mock.error_rate:
+                    with mock.lock:
+                        mock.errors += 1
+                    self.send(503, json.dumps({"errors": [{"message": "Service unavailable"}]}).encode("utf-8"))
+                    return
+                status, response_body, headers = mock.respond(message)
+                if mock.verbose:
+                    print(f"{status} {len(message['personalizations'])} personalizations, subject: {message.get('subject')}")
+                self.send(status, response_body, headers)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Usage example: run the mock, then send with --host http://127.0.0.1:3030
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the SendGrid mail send endpoint.")
+    parser.add_argument('--port', type=int, default=3030, help="Port to listen on.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds spent on each request.")
+    parser.add_argument('--rate-limit', type=int, help="Requests accepted per second, the others get a 429.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of the requests answered with a 503.")
+    args = parser.parse_args()
+
+    mock = MockSendGrid(port=args.port, latency=args.latency, rate_limit=args.rate_limit, error_rate=args.error_rate)
+    print(f"Mock SendGrid listening on {mock.url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.server.server_close()
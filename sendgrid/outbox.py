@@ -0,0 +1,310 @@
+# Durable outbox for outgoing emails: callers enqueue into SQLite, a background worker sends
+import argparse
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from send_email import EMAIL_PATTERN
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_LEASE = 300
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BACKOFF = 30.0
+DEFAULT_MAX_BACKOFF = 3600.0
+
+# pending: waiting to be sent; sending: claimed by a worker; sent: accepted by SendGrid; failed: given up
+STATUSES = ("pending", "sending", "sent", "failed")
+
+
+# Email_Outbox table, shared by the producers (enqueue) and the workers (claim and mark)
+class EmailOutbox:
+    def __init__(self, db_path: str):
+        """
+        Open the outbox, creating the Email_Outbox table if needed.
+        Args:
+            db_path (str): Path to the SQLite database file; it can be the database of the caller.
+        """
+        self.db_path = db_path
+        self.local = threading.local()
+        self.connection().executescript('''
+            CREATE TABLE IF NOT EXISTS Email_Outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dedup_key TEXT UNIQUE,
+                from_email TEXT NOT NULL,
+                to_emails TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                content TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                status_code INTEGER,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS Email_Outbox_due ON Email_Outbox (status, next_attempt_at);
+        ''')
+
+    def connection(self):
+        """Returns the connection of the current thread (SQLite connections cannot be shared between threads)"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            # WAL lets the producers enqueue while a worker is reading
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def enqueue(self, from_email: str, to_emails, subject: str, content: str, dedup_key: str = None):
+        """
+        Add an email to the outbox. Only an insert, so it adds no network latency to the caller.
+        Args:
+            from_email (str): Sender address.
+            to_emails (str or list): Recipient address(es).
+            subject (str): Subject of the email.
+            content (str): HTML content of the email.
+            dedup_key (str): Optional key identifying the email (e.g. "welcome:<email>"); an email whose
+                key is already in the outbox is not added again, so the callers can safely retry.
+        Returns:
+            int: Id of the new outbox entry, or None if the dedup_key was already enqueued.
+        Raises:
+            ValueError: If there is no recipient or an address is invalid; such an email could never be sent.
+        """
+        if isinstance(to_emails, str):
+            to_emails = [to_emails]
+        invalid = [email for email in to_emails if not isinstance(email, str) or not EMAIL_PATTERN.match(email)]
+        if not to_emails or invalid:
+            raise ValueError(f"Invalid recipients: {invalid or to_emails}")
+        now = time.time()
+        cursor = self.connection().execute('''
+            INSERT OR IGNORE INTO Email_Outbox (dedup_key, from_email, to_emails, subject, content, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (dedup_key, from_email, json.dumps(to_emails), subject, content, now, now))
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self, batch_size: int = DEFAULT_BATCH_SIZE, lease: float = DEFAULT_LEASE):
+        """
+        Claim the emails that are due, including those claimed by a worker that did not finish within the lease.
+        An email is only marked sent after SendGrid accepts it, so a crashed worker means a resend (at least once).
+        Returns:
+            list: Claimed entries as dicts (id, dedup_key, from_email, to_emails, subject, content, attempts).
+        """
+        conn = self.connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same rows
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute('''
+                SELECT * FROM Email_Outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND claimed_at <= ?)
+                ORDER BY next_attempt_at, id LIMIT ?
+            ''', (now, now - lease, batch_size)).fetchall()
+            conn.executemany('''
+                UPDATE Email_Outbox SET status = 'sending', claimed_at = ?, attempts = attempts + 1 WHERE id = ?
+            ''', [(now, row["id"]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry["to_emails"] = json.loads(entry["to_emails"])
+            entry["attempts"] += 1
+            entries.append(entry)
+        return entries
+
+    def mark_sent(self, entry_id: int, status_code: int):
+        self.connection().execute('''
+            UPDATE Email_Outbox SET status = 'sent', status_code = ?, last_error = NULL, sent_at = ? WHERE id = ?
+        ''', (status_code, time.time(), entry_id))
+
+    def mark_retry(self, entry_id: int, delay: float, status_code: int = None, error: str = None):
+        """Put a claimed email back in the queue, to be sent again after delay seconds"""
+        self.connection().execute('''
+            UPDATE Email_Outbox SET status = 'pending', next_attempt_at = ?, claimed_at = NULL, status_code = ?, last_error = ?
+            WHERE id = ?
+        ''', (time.time() + delay, status_code, error, entry_id))
+
+    def mark_failed(self, entry_id: int, status_code: int = None, error: str = None):
+        self.connection().execute('''
+            UPDATE Email_Outbox SET status = 'failed', claimed_at = NULL, status_code = ?, last_error = ? WHERE id = ?
+        ''', (status_code, error, entry_id))
+
+    def requeue_failed(self):
+        """Put the failed emails back in the queue, e.g. after fixing the API key. Returns how many"""
+        cursor = self.connection().execute('''
+            UPDATE Email_Outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'failed'
+        ''', (time.time(),))
+        return cursor.rowcount
+
+    def counts(self):
+        """Returns the number of emails in each status"""
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self.connection().execute("SELECT status, COUNT(*) FROM Email_Outbox GROUP BY status"):
+            counts[status] = count
+        return counts
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+# Background thread draining the outbox in batches through an EmailDispatcher
+class OutboxWorker:
+    def __init__(self, outbox: EmailOutbox, dispatcher, batch_size: int = DEFAULT_BATCH_SIZE,
+                 poll_interval: float = 1.0, lease: float = DEFAULT_LEASE, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 backoff: float = DEFAULT_BACKOFF, max_backoff: float = DEFAULT_MAX_BACKOFF):
+        """
+        Args:
+            outbox (EmailOutbox): Outbox to drain.
+            dispatcher (EmailDispatcher): Sends each batch concurrently, within the rate limits, with short retries.
+            batch_size (int): Emails claimed at a time.
+            poll_interval (float): Seconds between two looks at an empty outbox.
+            lease (float): Seconds after which an email claimed by a worker that did not finish is sent again.
+            max_attempts (int): Attempts before an email that keeps failing is marked failed.
+            backoff, max_backoff (float): Delay before the next attempt of a throttled or failed email,
+                doubled on each attempt up to max_backoff.
+        """
+        self.outbox = outbox
+        self.dispatcher = dispatcher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def run_once(self):
+        """
+        Send one batch of due emails.
+        Returns:
+            dict: Number of emails sent, retried and failed.
+        """
+        counts = {"sent": 0, "retried": 0, "failed": 0}
+        entries = self.outbox.claim(self.batch_size, self.lease)
+        if not entries:
+            return counts
+        jobs = []
+        for entry in entries:
+            try:
+                message = self.dispatcher.sender.build_message(entry["from_email"], entry["to_emails"], entry["subject"], entry["content"])
+                # Mail only checks the addresses when it is serialized
+                message.get()
+            except Exception as e:
+                # The email cannot be built (e.g. an invalid address): sending it again would not help
+                self.settle(entry, counts, False, None, f"{type(e).__name__}: {e}", retryable=False)
+                continue
+            jobs.append((entry, message))
+        try:
+            results = self.dispatcher.dispatch(jobs)
+        except Exception as e:
+            # Claimed entries are never left to their lease: the whole batch is retried, or failed after max_attempts
+            for entry, message in jobs:
+                self.settle(entry, counts, False, None, f"{type(e).__name__}: {e}", retryable=True)
+            return counts
+        for result in results:
+            self.settle(result.key, counts, result.ok, result.status_code, result.error, result.retryable)
+        return counts
+
+    def settle(self, entry, counts, ok, status_code, error, retryable):
+        """Mark a claimed email sent, to retry after a backoff, or failed, and count it"""
+        if ok:
+            self.outbox.mark_sent(entry["id"], status_code)
+            counts["sent"] += 1
+        elif retryable and entry["attempts"] < self.max_attempts:
+            delay = min(self.backoff * (2 ** (entry["attempts"] - 1)), self.max_backoff) * random.uniform(0.5, 1.0)
+            self.outbox.mark_retry(entry["id"], delay, status_code, error)
+            counts["retried"] += 1
+        else:
+            self.outbox.mark_failed(entry["id"], status_code, error)
+            counts["failed"] += 1
+
+    def drain(self):
+        """Send batches until no email is due. Returns the totals"""
+        totals = {"sent": 0, "retried": 0, "failed": 0}
+        while True:
+            counts = self.run_once()
+            for name, count in counts.items():
+                totals[name] += count
+            if not any(counts.values()):
+                return totals
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                counts = self.run_once()
+            except sqlite3.OperationalError as e:
+                # The database can stay locked by a long producer transaction; try again on the next poll
+                print(f"Outbox busy: {e}")
+                counts = None
+            except Exception as e:
+                # Keep the worker alive; the claimed emails are sent again once their lease expires
+                print(f"Outbox error: {type(e).__name__}: {e}")
+                counts = None
+            if counts and any(counts.values()):
+                print(f"Outbox: {counts['sent']} sent, {counts['retried']} to retry, {counts['failed']} failed")
+            else:
+                self.stop_event.wait(self.poll_interval)
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Stop after the current batch. Emails still claimed are sent again once their lease expires"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+
+# Runs the worker, e.g. python outbox.py outbox.db, or python outbox.py outbox.db --drain to empty it and exit
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the emails of an outbox database with SendGrid.")
+    parser.add_argument('db_file_location', type=str, help="Path to the SQLite DB file of the outbox.")
+    parser.add_argument('--host', type=str, help="Base URL of the API, e.g. http://127.0.0.1:3030 for mock_sendgrid.py.")
+    parser.add_argument('--drain', action='store_true', help="Send the due emails and exit instead of polling.")
+    parser.add_argument('--stats', action='store_true', help="Print the number of emails in each status and exit.")
+    parser.add_argument('--requeue-failed', action='store_true', help="Put the failed emails back in the queue first.")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Emails claimed at a time.")
+    parser.add_argument('--workers', type=int, default=4, help="API calls in flight at the same time.")
+    parser.add_argument('--rate', type=float, default=10.0, help="API calls per second.")
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help="Attempts before an email is marked failed.")
+    args = parser.parse_args()
+
+    outbox = EmailOutbox(args.db_file_location)
+    if args.stats:
+        print(json.dumps(outbox.counts()))
+        exit(0)
+    if args.requeue_failed:
+        print(f"{outbox.requeue_failed()} failed emails queued again")
+
+    from send_email import EmailConfig, SendGridEmailSender
+    from dispatcher import EmailDispatcher
+
+    sender = SendGridEmailSender(EmailConfig(os.getenv('SENDGRID_API_KEY'), args.host))
+    # The outbox spaces out the long retries, the dispatcher only retries briefly within a batch
+    dispatcher = EmailDispatcher(sender, workers=args.workers, rate=args.rate, max_retries=2)
+    worker = OutboxWorker(outbox, dispatcher, batch_size=args.batch_size, max_attempts=args.max_attempts)
+
+    if args.drain:
+        totals = worker.drain()
+        print(f"{totals['sent']} sent, {totals['retried']} to retry, {totals['failed']} failed. Outbox: {json.dumps(outbox.counts())}")
+    else:
+        print(f"Sending the emails of {args.db_file_location}, press Ctrl+C to stop")
+        worker.start()
+        try:
+            while worker.thread.is_alive():
+                worker.thread.join(1)
+        except KeyboardInterrupt:
+            worker.stop()
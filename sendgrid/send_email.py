@@ -1,55 +1,159 @@
 # Using SendGrid's Python Library
 # https://github.com/sendgrid/sendgrid-python
 import os
+import re
 import argparse
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Mail, Personalization, To, Substitution
+from python_http_client.exceptions import HTTPError
+
+# Maximum number of personalizations (and recipients) SendGrid accepts in one request
+MAX_PERSONALIZATIONS = 1000
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
 # Email configuration
 class EmailConfig:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, host: str = None):
         self.api_key = api_key
+        # Base URL of the API, e.g. a local mock endpoint (defaults to https://api.sendgrid.com)
+        self.host = host
+
+# Result of one bulk request, or of the invalid recipients that were never sent (batch None)
+class BatchResult:
+    def __init__(self, batch: int, status_code: int = None, accepted: list = None, failed: list = None, error: str = None):
+        self.batch = batch
+        self.status_code = status_code
+        self.accepted = accepted or []
+        self.failed = failed or []
+        self.error = error
+
+    def to_dict(self):
+        return {
+            "batch": self.batch,
+            "status_code": self.status_code,
+            "accepted": self.accepted,
+            "failed": self.failed,
+            "error": self.error
+        }
+
+def split_valid_recipients(recipients: list):
+    """Splits recipients into those with a valid address and failure entries for the others"""
+    valid = []
+    invalid = []
+    for recipient in recipients:
+        if EMAIL_PATTERN.match(recipient.get("email") or ""):
+            valid.append(recipient)
+        else:
+            invalid.append({"email": recipient.get("email"), "error": "Invalid email address"})
+    return valid, invalid
+
+def with_invalid_recipients(results: list, invalid: list):
+    """Appends the invalid recipients as their own result, with no batch, as they were part of no API call"""
+    if invalid:
+        results.append(BatchResult(None, failed=invalid))
+    return results
+
+def make_batches(recipients: list, batch_size: int = MAX_PERSONALIZATIONS):
+    """Splits recipients into batches that fit in one API call"""
+    batch_size = min(batch_size, MAX_PERSONALIZATIONS)
+    return [recipients[start:start + batch_size] for start in range(0, len(recipients), batch_size)]
 
 # Email sender using SendGrid
 class SendGridEmailSender:
     def __init__(self, config: EmailConfig):
         self.config = config
-        self.client = SendGridAPIClient(self.config.api_key)
+        if self.config.host:
+            self.client = SendGridAPIClient(self.config.api_key, host=self.config.host)
+        else:
+            self.client = SendGridAPIClient(self.config.api_key)
 
-    def send_email(self, from_email: str, to_emails: list, subject: str, content: str):
-        """Sends an email using the SendGrid API"""
-        # Create the email object
-        message = Mail(
+    def build_message(self, from_email: str, to_emails: list, subject: str, content: str):
+        """Builds the email object of a single email"""
+        return Mail(
             from_email=from_email,
             to_emails=to_emails,
             subject=subject,
             html_content=content
         )
-        
+
+    def deliver(self, message: Mail):
+        """Sends an email object, raising python_http_client HTTPError when the API rejects it"""
+        return self.client.send(message)
+
+    def send_email(self, from_email: str, to_emails: list, subject: str, content: str):
+        """Sends an email using the SendGrid API"""
+        # Create the email object
+        message = self.build_message(from_email, to_emails, subject, content)
+
         try:
             # Send the email
-            response = self.client.send(message)
+            response = self.deliver(message)
             print(f"Email sent! Status code: {response.status_code}")
             return response
         except Exception as e:
             print(f"Failed to send email: {e}")
             return None
 
+    def build_bulk_message(self, from_email: str, recipients: list, subject: str, content: str):
+        """Builds one Mail with a personalization per recipient, so nobody sees the other addresses"""
+        message = Mail(from_email=from_email, subject=subject, html_content=content)
+        for index, recipient in enumerate(recipients):
+            personalization = Personalization()
+            personalization.add_to(To(recipient["email"]))
+            for key, value in recipient.get("substitutions", {}).items():
+                personalization.add_substitution(Substitution(key, str(value)))
+            message.add_personalization(personalization, index=index)
+        return message
+
+    def send_bulk_email(self, from_email: str, recipients: list, subject: str, content: str,
+                        batch_size: int = MAX_PERSONALIZATIONS):
+        """
+        Sends the same email to many recipients, packing up to batch_size of them in each API call.
+        Each recipient is a dict with an "email" and optional "substitutions", e.g.
+        {"email": "jane@example.com", "substitutions": {"-name-": "Jane"}}, whose keys are
+        replaced in the subject and content for that recipient only.
+        Returns a list of BatchResult with the accepted and failed recipients of each batch.
+        Recipients with an invalid address are not sent; they are reported in a last BatchResult whose batch is None.
+        """
+        valid, invalid = split_valid_recipients(recipients)
+
+        results = []
+        for batch in make_batches(valid, batch_size):
+            emails = [recipient["email"] for recipient in batch]
+            result = BatchResult(len(results))
+            try:
+                response = self.deliver(self.build_bulk_message(from_email, batch, subject, content))
+                result.status_code = response.status_code
+                result.accepted = emails
+            except HTTPError as e:
+                result.status_code = e.status_code
+                result.error = e.body.decode("utf-8", "replace") if isinstance(e.body, bytes) else str(e.body)
+                result.failed = [{"email": email, "error": result.error} for email in emails]
+            except Exception as e:
+                result.error = str(e)
+                result.failed = [{"email": email, "error": result.error} for email in emails]
+            print(f"Batch {result.batch}: {len(result.accepted)} accepted, {len(result.failed)} failed (status code: {result.status_code})")
+            results.append(result)
+
+        return with_invalid_recipients(results, invalid)
+
 # Usage example
 if __name__ == "__main__":
+    # Get the from and to email addresses from the arguments introduced by the user when running the script
+    parser = argparse.ArgumentParser(description="Send an email to a recipient using SendGrid.")
+    parser.add_argument('from_email', type=str, help="The email address of the sender.")
+    parser.add_argument('to_email', type=str, help="The email address of the recipient.")
+    parser.add_argument('--host', type=str, help="Base URL of the API, e.g. http://127.0.0.1:3030 for mock_sendgrid.py.")
+    args = parser.parse_args()
+
     # Configure API key from environment variable
     api_key = os.getenv('SENDGRID_API_KEY')
-    email_config = EmailConfig(api_key)
+    email_config = EmailConfig(api_key, args.host)
 
     # Initialize email sender
     email_sender = SendGridEmailSender(email_config)
 
     # Send an email
-    # Get the from and to email addresses from the arguments introduced by the user when running the script
-    parser = argparse.ArgumentParser(description="Send an email to a recipient using SendGrid.")
-    parser.add_argument('from_email', type=str, help="The email address of the sender.")
-    parser.add_argument('to_email', type=str, help="The email address of the recipient.")
-    args = parser.parse_args()
 
     subject = "Hello from rettX"
     content = "<p>This is a test email sent using SendGrid API.</p>"